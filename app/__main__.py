@@ -1,11 +1,174 @@
-# import asyncio
-# from .crawler import crawl
+"""
+Headless crawl, without web server:
 
+    python -m app crawl [--count N] [--interval S] [--format json|ndjson|msgpack] [--mode path|peers] [-o FILE]
 
-# async def main():
-#     res = await crawl("path")
-#     print(res)
+Snapshot is written to stdout or to file (replaced atomically, `{generation}` in name is substituted,
+so `-o map-{generation}.json` keeps every crawl). Progress and timings go to stderr.
 
+    SNAPSHOT_PATH=/dev/shm/ygg-map python -m app publish
 
-# if __name__ == "__main__":
-#     asyncio.run(main())
+Crawls forever, as web app does, and publishes snapshots for web workers with `ROLE=server` (see `shared`).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from loguru import logger
+
+from .config import settings
+
+# crawler stack is imported after logging is set up (it logs on import and on creation of clients)
+if TYPE_CHECKING:
+    from .crawler import Crawler
+    from .snapshot import Snapshot
+
+FORMATS = ("json", "ndjson", "msgpack")
+
+
+def export(snapshot: "Snapshot", args: argparse.Namespace) -> Iterable[bytes]:
+    from . import stream
+
+    if args.format == "msgpack":
+        chunks: Iterable[bytes] = [snapshot.packed(args.mode)]
+        return stream.compress(chunks, args.compression) if args.compression else chunks
+
+    return stream.stream(snapshot, args.mode, args.format, args.fields, args.compression)
+
+
+def write(chunks: Iterable[bytes], output: str, generation: int) -> int:
+    """Returns written bytes"""
+    written = 0
+
+    if output == "-":
+        for chunk in chunks:
+            written += sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return written
+
+    path = Path(output.format(generation=generation))
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            for chunk in chunks:
+                written += f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    return written
+
+
+async def progress(crawler: "Crawler", every: float) -> None:
+    while True:
+        await asyncio.sleep(every)
+        logger.info(
+            f"Crawled {len(crawler.peers)} nodes, {crawler.keys_queue.qsize()} in queue, "
+            f"{len(crawler.deferred_keys)} deferred"
+        )
+
+
+async def refresh(crawler: "Crawler") -> None:
+    if settings.change_detection:
+        await crawler.refresh_changed()
+    else:
+        await crawler.refresh()
+
+
+async def crawl(args: argparse.Namespace) -> None:
+    from .crawler import Crawler
+
+    async with Crawler() as crawler:
+        for i in range(args.count):
+            if i and args.interval:
+                await asyncio.sleep(args.interval)
+
+            reporter = asyncio.create_task(progress(crawler, args.progress)) if args.progress else None
+            started = time.perf_counter()
+            try:
+                await refresh(crawler)
+            finally:
+                if reporter is not None:
+                    reporter.cancel()
+            crawled = time.perf_counter()
+
+            snapshot = crawler.snapshot
+            written = write(export(snapshot, args), args.output, snapshot.generation)
+            exported = time.perf_counter()
+
+            records = snapshot.records(args.mode)
+            logger.info(
+                f"Crawl {i + 1}/{args.count}: snapshot #{snapshot.generation}, "
+                f"{len(records.nodes)} nodes, {len(records.edges)} edges, {written} bytes; "
+                f"crawl {crawled - started:.2f}s, export {exported - crawled:.2f}s"
+            )
+
+
+async def publish() -> None:
+    from .crawler import Crawler
+    from .scheduler import RollingScheduler
+
+    async with Crawler() as crawler:
+        if settings.crawl_mode == "rolling":
+            logger.info(f"Starting rolling crawl, freshness {settings.freshness_seconds} seconds")
+            await RollingScheduler(crawler).run()
+            return
+
+        logger.info(f"Starting refresh every {settings.refresh_seconds} seconds")
+        while True:
+            try:
+                await refresh(crawler)
+            except Exception as ex:
+                logger.warning(f"Map refresh exc: {ex!r}")
+            await asyncio.sleep(settings.refresh_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = commands.add_parser("crawl", help="crawl network and write snapshot")
+    crawl_parser.add_argument("-n", "--count", type=int, default=1, help="number of crawls")
+    crawl_parser.add_argument("--interval", type=float, default=0, help="seconds between crawls")
+    crawl_parser.add_argument("-f", "--format", choices=FORMATS, default="json")
+    crawl_parser.add_argument("-m", "--mode", choices=("path", "peers"), default="path")
+    crawl_parser.add_argument("--fields", help="node/edge fields for json/ndjson, see /state/stream")
+    crawl_parser.add_argument("-c", "--compression", choices=("gzip", "zstd"))
+    crawl_parser.add_argument("-o", "--output", default="-", help="file, `-` for stdout")
+    crawl_parser.add_argument("--progress", type=float, default=5, help="progress log interval, 0 to disable")
+    crawl_parser.add_argument("-q", "--quiet", action="store_true", help="log only warnings")
+
+    commands.add_parser("publish", help="crawl forever and publish snapshots to SNAPSHOT_PATH for web workers")
+
+    args = parser.parse_args()
+
+    match args.command:
+        case "crawl":
+            if args.quiet:
+                logger.remove()
+                logger.add(sys.stderr, level="WARNING")
+
+            from . import stream
+
+            if args.count < 1:
+                parser.error("--count must be positive")
+            if args.compression == "zstd" and stream.zstandard is None:
+                parser.error("zstd compression unavailable: install zstandard")
+
+            asyncio.run(crawl(args))
+
+        case "publish":
+            if settings.snapshot_path is None:
+                parser.error("SNAPSHOT_PATH is not set")
+
+            asyncio.run(publish())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Compact binary export for machine consumers.
+
+Document is MessagePack map, nodes are referenced by index instead of 256-bit ids:
+
+    {
+        "format": "ygg-map", "version": 1, "byteorder": "little",
+        "generation": int, "mode": "path" | "peers",
+        "nodes": {
+            "count": N,
+            "key": bin[32 * N],           # raw node keys, zeroes for path placeholders
+            "label": [str] * N,
+            "buildplatform": {"values": [str], "codes": bin[uint32 * N]},
+            "buildversion": {...}, "cluster": {...},
+        },
+        "edges": {
+            "count": E,
+            "indptr": bin[uint32 * (N + 1)],  # CSR by `from` node index
+            "indices": bin[uint32 * E],       # `to` node index
+            "arrows": {"values": [str | None], "codes": bin[uint32 * E]},
+        },
+        "clusters": [str],
+    }
+
+In peers mode edges can reference crawled nodes, which are not in lookups (at least own node):
+they are appended after nodes from lookups, with node name as label.
+
+All `bin` columns are plain little-endian arrays, so they can be used without copying
+(e.g. `numpy.frombuffer(doc["edges"]["indices"], "<u4")`).
+"""
+
+import struct
+import sys
+from array import array
+from typing import TYPE_CHECKING, Any, Iterable
+
+from .models import MODE, PeerData
+from .records import Record, peer_record
+
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MEDIA_TYPE = MEDIA_TYPES[0]
+
+VERSION = 1
+
+
+def accepts(accept: str | None) -> bool:
+    """Check `Accept` header for msgpack"""
+    if not accept:
+        return False
+    return any(media.split(";", 1)[0].strip() in MEDIA_TYPES for media in accept.split(","))
+
+
+def _uint32(values: Iterable[int]) -> bytes:
+    arr = array("I", values)
+    assert arr.itemsize == 4
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _dictionary(column: Iterable[Any]) -> dict[str, Any]:
+    values: dict[Any, int] = {}
+    codes = [values.setdefault(value, len(values)) for value in column]
+    return {"values": list(values), "codes": _uint32(codes)}
+
+
+def pack_snapshot(snapshot: "Snapshot", mode: MODE) -> bytes:
+    records = snapshot.records(mode)
+
+    nodes: list[Record] = list(records.nodes)
+    keys: list[str] = list(records.keys)
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+
+    # json export just has edges to unknown ids, here every edge end needs a row
+    for edge in records.edges:
+        for node_id in (edge["from"], edge["to"]):
+            if node_id not in index:
+                key = f"{node_id:064x}"
+                index[node_id] = len(nodes)
+                nodes.append(peer_record(snapshot.peers.get(key) or PeerData(key=key)))
+                keys.append(key)
+
+    # CSR: edges grouped by `from` index, stable inside group
+    order = sorted(range(len(records.edges)), key=lambda i: index[records.edges[i]["from"]])
+    indptr = [0] * (len(nodes) + 1)
+    for edge in records.edges:
+        indptr[index[edge["from"]] + 1] += 1
+    for i in range(len(nodes)):
+        indptr[i + 1] += indptr[i]
+
+    empty_key = bytes(32)
+    doc = {
+        "format": "ygg-map",
+        "version": VERSION,
+        "byteorder": "little",
+        "generation": snapshot.generation,
+        "mode": mode,
+        "nodes": {
+            "count": len(nodes),
+            "key": b"".join(bytes.fromhex(key) if key else empty_key for key in keys),
+            "label": [node["label"] for node in nodes],
+            "buildplatform": _dictionary(node["buildplatform"] for node in nodes),
+            "buildversion": _dictionary(node["buildversion"] for node in nodes),
+            "cluster": _dictionary(node["cluster"] for node in nodes),
+        },
+        "edges": {
+            "count": len(records.edges),
+            "indptr": _uint32(indptr),
+            "indices": _uint32(index[records.edges[i]["to"]] for i in order),
+            "arrows": _dictionary(records.edges[i]["arrows"] for i in order),
+        },
+        "clusters": sorted(records.clusters | {node["cluster"] for node in nodes[len(records.nodes) :]}),
+    }
+    return packb(doc)
+
+
+def packb(obj: Any) -> bytes:
+    """Minimal MessagePack encoder: nil, bool, int, float, str, bin, array and map"""
+    buf = bytearray()
+    _pack(obj, buf)
+    return bytes(buf)
+
+
+def _pack(obj: Any, buf: bytearray) -> None:
+    if obj is None:
+        buf.append(0xC0)
+    elif obj is True:
+        buf.append(0xC3)
+    elif obj is False:
+        buf.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(obj, buf)
+    elif isinstance(obj, float):
+        buf += struct.pack(">Bd", 0xCB, obj)
+    elif isinstance(obj, str):
+        data = obj.encode()
+        n = len(data)
+        if n < 32:
+            buf.append(0xA0 | n)
+        elif n < 2**8:
+            buf += struct.pack(">BB", 0xD9, n)
+        elif n < 2**16:
+            buf += struct.pack(">BH", 0xDA, n)
+        else:
+            buf += struct.pack(">BI", 0xDB, n)
+        buf += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        n = len(obj)
+        if n < 2**8:
+            buf += struct.pack(">BB", 0xC4, n)
+        elif n < 2**16:
+            buf += struct.pack(">BH", 0xC5, n)
+        else:
+            buf += struct.pack(">BI", 0xC6, n)
+        buf += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), 0x90, 0xDC, buf)
+        for item in obj:
+            _pack(item, buf)
+    elif isinstance(obj, dict):
+        _pack_header(len(obj), 0x80, 0xDE, buf)
+        for key, value in obj.items():
+            _pack(key, buf)
+            _pack(value, buf)
+    else:
+        raise TypeError(f"Can't pack {type(obj)}")
+
+
+def _pack_header(n: int, fix: int, code16: int, buf: bytearray) -> None:
+    # array/map: fix* for < 16 items, then 16 and 32 bit lengths (code32 = code16 + 1)
+    if n < 16:
+        buf.append(fix | n)
+    elif n < 2**16:
+        buf += struct.pack(">BH", code16, n)
+    else:
+        buf += struct.pack(">BI", code16 + 1, n)
+
+
+def _pack_int(n: int, buf: bytearray) -> None:
+    if 0 <= n < 0x80:
+        buf.append(n)
+    elif -32 <= n < 0:
+        buf += struct.pack(">b", n)
+    elif n >= 0:
+        if n < 2**8:
+            buf += struct.pack(">BB", 0xCC, n)
+        elif n < 2**16:
+            buf += struct.pack(">BH", 0xCD, n)
+        elif n < 2**32:
+            buf += struct.pack(">BI", 0xCE, n)
+        elif n < 2**64:
+            buf += struct.pack(">BQ", 0xCF, n)
+        else:
+            raise OverflowError(f"{n} doesn't fit into uint64")
+    else:
+        if n >= -(2**7):
+            buf += struct.pack(">Bb", 0xD0, n)
+        elif n >= -(2**15):
+            buf += struct.pack(">Bh", 0xD1, n)
+        elif n >= -(2**31):
+            buf += struct.pack(">Bi", 0xD2, n)
+        elif n >= -(2**63):
+            buf += struct.pack(">Bq", 0xD3, n)
+        else:
+            raise OverflowError(f"{n} doesn't fit into int64")
@@ -0,0 +1,115 @@
+"""
+Change detection for sweep crawl.
+
+Before remote crawl we look at cheap local views: `gettree`, `getpaths`, `lookups` and
+`getself().routing_entries`. If they did not change since previous crawl, remote crawl is skipped.
+If they did, only changed nodes and their old and new tree parents are re-crawled
+(coordinates of everything else come from lookups anyway).
+Full crawl is still done every `full_refresh_every` refreshes, to catch changes which are not visible locally.
+"""
+
+from typing import NamedTuple
+
+from loguru import logger
+
+from .config import settings
+from .ygg import Key, RequestError, ValidationError, Yggdrasil
+
+
+class LocalView(NamedTuple):
+    # None if request failed, such parts are not compared
+    tree: dict[Key, Key] | None
+    paths: dict[Key, tuple[int, ...]] | None
+    lookups: dict[Key, tuple[int, ...]] | None
+    routing_entries: int | None
+
+
+class Changes(NamedTuple):
+    # keys to re-crawl
+    changed: set[Key]
+    # keys, which are gone from local views
+    removed: set[Key]
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed)
+
+
+class ChangeDetector:
+    previous: LocalView | None
+    pending: LocalView | None
+
+    # refreshes since last full crawl
+    since_full: int
+
+    def __init__(self) -> None:
+        self.previous = None
+        self.pending = None
+        self.since_full = 0
+
+    async def observe(self, ygg: Yggdrasil) -> LocalView:
+        async def safe(coro):
+            try:
+                return await coro
+            except (RequestError, ValidationError) as ex:
+                logger.warning(f"Local view failed: {ex!r}")
+                return None
+
+        tree = await safe(ygg.get_tree())
+        paths = await safe(ygg.get_paths())
+        lookups = await safe(ygg.lookups())
+        self_info = await safe(ygg.get_self())
+
+        return LocalView(
+            tree={entry.key: entry.parent for entry in tree.tree} if tree else None,
+            paths={info.key: tuple(info.path) for info in paths.infos} if paths else None,
+            # lookup time changes all the time, so only coords are compared
+            lookups={info.key: tuple(info.path) for info in lookups.infos} if lookups else None,
+            routing_entries=self_info.routing_entries if self_info else None,
+        )
+
+    async def plan(self, ygg: Yggdrasil) -> Changes | None:
+        """What to re-crawl, or None if full crawl is needed. Call `commit()` after successful crawl"""
+        self.pending = await self.observe(ygg)
+
+        if self.previous is None or self.since_full + 1 >= settings.full_refresh_every:
+            return None
+
+        changes = diff(self.previous, self.pending)
+        known = len(self.previous.lookups or self.previous.tree or ())
+        if len(changes.changed) > known / 2:
+            logger.info(f"Too many changes ({len(changes.changed)} of {known}), doing full crawl")
+            return None
+
+        return changes
+
+    def commit(self, full: bool) -> None:
+        self.previous = self.pending
+        self.since_full = 0 if full else self.since_full + 1
+
+
+def diff(old: LocalView, new: LocalView) -> Changes:
+    changed: set[Key] = set()
+    removed: set[Key] = set()
+
+    if old.tree is not None and new.tree is not None:
+        for key in old.tree.keys() - new.tree.keys():
+            removed.add(key)
+            changed.add(old.tree[key])
+        for key, parent in new.tree.items():
+            if old.tree.get(key) != parent:
+                # link between node and its parent changed: both ends have new peers
+                changed.update((key, parent))
+                if key in old.tree:
+                    changed.add(old.tree[key])
+
+    for old_coords, new_coords in ((old.paths, new.paths), (old.lookups, new.lookups)):
+        if old_coords is None or new_coords is None:
+            continue
+        changed.update(key for key, path in new_coords.items() if old_coords.get(key) != path)
+
+    if not changed and not removed and old.routing_entries != new.routing_entries:
+        # something changed, but we don't know what
+        logger.info(f"Routing entries changed: {old.routing_entries} -> {new.routing_entries}")
+        changed.update(new.tree or new.lookups or ())
+
+    return Changes(changed=changed - removed, removed=removed)
@@ -1,6 +1,8 @@
+import functools
 import os
 import platform
 import sys
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import FilePath
 from pathlib import Path
@@ -15,6 +17,45 @@ class Settings(BaseSettings):
 
     reload_bad: bool = True
 
+    # "sweep": full crawl every `refresh_seconds`
+    # "rolling": continuous re-probing, every node is re-crawled within `freshness_seconds`
+    crawl_mode: Literal["sweep", "rolling"] = "sweep"
+    freshness_seconds: int = 60 * 10
+    publish_seconds: int = 30
+
+    # skip or narrow sweep crawl, when local tree/paths/lookups did not change
+    change_detection: bool = False
+    full_refresh_every: int = 10
+
+    # remote requests (to the overlay) per second for all workers, 0 - unlimited
+    rpc_rate: float = 0
+    # same, per request type: {"getnodeinfo": 10}
+    rpc_type_rates: dict[str, float] = {}
+    # same, per remote key
+    rpc_key_rate: float = 0
+    rpc_key_burst: float = 3
+
+    # max keys in crawl queue, 0 - unbounded
+    queue_size: int = 4096
+
+    # crawl sharding: shard 0 is coordinator (web app), others are `python -m app.shard`
+    shards: int = 1
+    shard_index: int = 0
+    shard_address: str | None = None
+    # seconds, in which shard must answer dispatched key (including time in its queue), or coordinator crawls it itself
+    shard_timeout: float = 120
+
+    # multi-process serving: crawling process (web app or `python -m app publish`) writes every snapshot
+    # to `snapshot_path` (better on tmpfs, e.g. /dev/shm), web workers with role "server" only serve it
+    role: Literal["all", "server"] = "all"
+    snapshot_path: Path | None = None
+    # uvicorn workers for `start()`, more than one only for role "server"
+    http_workers: int = 1
+
+    # crawl reports: length of slowest/failing keys lists, and how many reports to keep
+    report_top: int = 10
+    report_history: int = 50
+
     @property
     def ygg(self) -> Path | str:
         if self.socket:
@@ -35,7 +76,11 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-if platform.system() == "Windows":
-    from graphviz.backend import dot_command
 
-    dot_command.DOT_BINARY = Path(r"C:\Program Files\Graphviz\bin\dot.exe")
+@functools.cache
+def setup_graphviz() -> None:
+    """Called before first graphviz use, so graphviz is not imported on startup"""
+    if platform.system() == "Windows":
+        from graphviz.backend import dot_command
+
+        dot_command.DOT_BINARY = Path(r"C:\Program Files\Graphviz\bin\dot.exe")
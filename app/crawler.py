@@ -1,99 +1,19 @@
 import asyncio
+from collections import deque
 from types import TracebackType
-from typing import AsyncContextManager, Literal, NewType, Self, TypeAlias
+from typing import TYPE_CHECKING, AsyncContextManager
 
 from loguru import logger
-from pydantic import BaseModel, Field
 
+from .changes import ChangeDetector
 from .config import settings
-from .ygg import Addr, EmptyKey, GetSelfResponse, Key, RequestError, Yggdrasil
+from .models import MODE, UNK, CrawlResult, EnrichedPeerData, Export, PeerData
+from .report import CrawlRecorder, CrawlReport
+from .snapshot import Snapshot
+from .ygg import GetSelfResponse, Key, RequestError, Yggdrasil
 
-UNK = "unknown"
-
-NodeId = NewType("NodeId", int)
-MODE: TypeAlias = Literal["path"] | Literal["peers"]
-
-
-def get_id(key: Key) -> NodeId:
-    return NodeId(int(key, 16))
-
-
-class PeerData(BaseModel):
-    key: Key
-
-    name: str = UNK
-
-    buildname: str = UNK
-    buildversion: str = UNK
-
-    buildarch: str = UNK
-    buildplatform: str = UNK
-
-    cluster: str | None = None
-
-
-class EnrichedPeerData(PeerData):
-    addr: Addr
-    key: Key | EmptyKey
-
-    path: list[int]
-
-    @property
-    def label(self) -> str:
-        return f"{self.name} - {self.addr[:8]}"
-
-    @property
-    def parent(self) -> list[int]:
-        return self.path[:-1] if len(self.path) > 0 else []
-
-    @property
-    def tpath(self) -> tuple[int, ...]:
-        return tuple(self.path)
-
-    @property
-    def id(self) -> NodeId:
-        if self.key != "":
-            return get_id(self.key)
-        else:
-            return NodeId(
-                hash(
-                    (
-                        self.addr,
-                        self.key,
-                        self.name,
-                        tuple(self.path),
-                    )
-                )
-            )
-
-    @classmethod
-    def empty(cls: type[Self], path: list[int]) -> Self:
-        return cls(
-            addr=Addr(""),
-            key=EmptyKey(""),
-            path=path,
-        )
-
-
-class Export(BaseModel):
-    class Node(BaseModel):
-        id: NodeId
-        label: str
-        buildplatform: str = UNK
-        buildversion: str = UNK
-        cluster: str | None = None
-
-    class Edge(BaseModel):
-        from_: NodeId = Field(serialization_alias="from")
-        to: NodeId
-
-        dashes: bool = False
-        arrows: Literal["to"] | Literal["from"] | Literal["to;from"] | str | None = None
-
-    nodes: list[Node] = []
-    edges: list[Edge] = []
-
-    clusters: set[str] = set()
+if TYPE_CHECKING:
+    from .shard import ShardServer
 
 
 class Crawler(AsyncContextManager):
@@ -110,20 +30,49 @@ class Crawler(AsyncContextManager):
 
     key_locks: dict[Key, bool]
     keys_queue: asyncio.Queue[Key]
+    # keys found by workers, while queue was full
+    deferred_keys: set[Key]
 
     workers: list
 
+    snapshot: Snapshot
+    shards: "ShardServer | None"
+
+    changes: ChangeDetector
+
+    # remote requests of own clients, for report of next generation
+    recorder: CrawlRecorder
+    reports: deque[CrawlReport]
+
     def __init__(self) -> None:
+        self.recorder = CrawlRecorder()
+        self.reports = deque(maxlen=settings.report_history)
+
         self.ygg = Yggdrasil()
+        self.ygg.recorder = self.recorder
         self.refresh_lock = asyncio.Lock()
 
+        self.snapshot = Snapshot.empty()
+        self.shards = None
+
+        self.changes = ChangeDetector()
+
+        self.deferred_keys = set()
+
     async def init(self) -> None:
         self.self_info = await self.ygg.get_self()
-        self.keys_queue = asyncio.Queue()
+        self.keys_queue = asyncio.Queue(maxsize=settings.queue_size)
+
+        if settings.shards > 1 and settings.shard_address:
+            from .shard import ShardServer
+
+            self.shards = ShardServer(self)
+            await self.shards.start()
 
         self.workers = []
         for _ in range(settings.workers):
             ygg = Yggdrasil()
+            ygg.recorder = self.recorder
             worker = asyncio.create_task(self.worker(ygg))
             self.workers.append(worker)
 
@@ -136,6 +85,10 @@ class Crawler(AsyncContextManager):
         self.enriched_peers = {}
         self.peers_connections = {}
         self.key_locks = {}
+        self.deferred_keys = set()
+
+        if self.shards is not None:
+            self.shards.reset()
 
     async def refresh(self):
         if self.refresh_lock.locked():
@@ -145,49 +98,141 @@ class Crawler(AsyncContextManager):
         async with self.refresh_lock:
             # reset arrs
             self.reset()
+            self.recorder.reset("full")
 
-            # find self info
-            peer_data = await self.remote_get_info(self.self_info.key, ygg=self.ygg)
-            # FIXME: temporary?? solution b/c (only windows??) ygg client refuses to do remote_* with self key
-            peer_data = peer_data or PeerData(
-                key=self.self_info.key,
-                name="idk, root",
-                buildname=self.self_info.build_name,
-                buildversion=self.self_info.build_version,
-                buildarch=UNK,
-                buildplatform=UNK,
-            )
-            self.peers[peer_data.key] = peer_data
-            logger.info(f"Got self: {peer_data}")
+            await self.fill_self()
 
             # get peers, which i connected to
-            root_peers = await self.ygg.get_peers()
-            for peer in root_peers.peers:
-                if not peer.up:
-                    continue
-
+            for key in await self.root_keys():
                 # for every peer - add to queue.
-                await self.put_key_to_queue(peer.key)
+                await self.put_key_to_queue(key)
 
             logger.info(f"{self.keys_queue.qsize() = }")
-            await self.keys_queue.join()
+            await self.join_queue()
             logger.info(f"Done waiting {self.keys_queue.qsize() = }")
 
-            # get all lookups...
-            lookups = await self.ygg.lookups()
-            for lookup in lookups.infos:
-                node_info = self.peers.get(lookup.key, None)
-                if not node_info:
-                    if settings.reload_bad:
-                        logger.warning(f"{lookup} not found in nodes cache, reloading")
-                        await self.fill_for_key(lookup.key, self.ygg)
+            await self.merge_lookups(reload_bad=settings.reload_bad)
+
+            self.publish()
+
+    async def refresh_changed(self) -> None:
+        """Refresh, which skips or narrows remote crawl, when local views did not change (see `changes`)"""
+        if self.refresh_lock.locked():
+            logger.warning(f"Refresh already requested: {self.refresh_lock = }")
+            return
 
-                    node_info = self.peers.get(lookup.key, PeerData(key=lookup.key))
+        changes = await self.changes.plan(self.ygg)
+        if changes is None:
+            await self.refresh()
+            self.changes.commit(full=True)
+        elif not changes:
+            logger.info("Local views did not change, skipping crawl")
+            self.changes.commit(full=False)
+        else:
+            logger.info(f"Local views changed: re-crawling {len(changes.changed)}, removing {len(changes.removed)}")
+            await self.refresh_keys(changes.changed, changes.removed)
+            self.changes.commit(full=False)
 
-                node = EnrichedPeerData.model_validate(lookup.model_dump() | node_info.model_dump())
-                self.enriched_peers[node.key] = node
+    async def refresh_keys(self, keys: set[Key], removed: set[Key] = set()) -> None:
+        """Re-crawl only `keys` (and nodes found through them), keep everything else from current snapshot"""
+        if self.refresh_lock.locked():
+            logger.warning(f"Refresh already requested: {self.refresh_lock = }")
+            return
 
-    async def put_key_to_queue(self, key: Key) -> None:
+        async with self.refresh_lock:
+            self.recorder.reset("partial")
+            self.peers = dict(self.snapshot.peers)
+            self.peers_connections = dict(self.snapshot.peers_connections)
+            self.key_locks = {}
+            self.deferred_keys = set()
+
+            own = self.self_info.key
+            for key in (keys | removed) - {own}:
+                self.peers.pop(key, None)
+                self.peers_connections.pop(key, None)
+
+            # own node is not crawled by workers, see `put_key_to_queue`
+            if own in keys:
+                await self.fill_self()
+
+            for key in keys:
+                await self.put_key_to_queue(key)
+
+            await self.join_queue()
+
+            await self.merge_lookups(reload_bad=settings.reload_bad)
+
+            self.publish()
+
+    async def fill_self(self) -> None:
+        # find self info
+        peer_data = await self.remote_get_info(self.self_info.key, ygg=self.ygg)
+        # FIXME: temporary?? solution b/c (only windows??) ygg client refuses to do remote_* with self key
+        peer_data = peer_data or PeerData(
+            key=self.self_info.key,
+            name="idk, root",
+            buildname=self.self_info.build_name,
+            buildversion=self.self_info.build_version,
+            buildarch=UNK,
+            buildplatform=UNK,
+        )
+        self.peers[peer_data.key] = peer_data
+        logger.info(f"Got self: {peer_data}")
+
+    async def root_keys(self) -> list[Key]:
+        root_peers = await self.ygg.get_peers()
+        return [peer.key for peer in root_peers.peers if peer.up]
+
+    async def merge_lookups(self, reload_bad: bool) -> list[Key]:
+        """Build `enriched_peers` from lookups. Returns keys, which were not crawled yet"""
+        # get all lookups...
+        lookups = (await self.ygg.lookups()).infos
+
+        not_crawled = [lookup.key for lookup in lookups if lookup.key not in self.peers]
+        self.recorder.not_crawled = not_crawled
+        self.recorder.reloaded = reload_bad
+        if reload_bad:
+            for key in not_crawled:
+                logger.warning(f"{key} not found in nodes cache, reloading")
+                await self.fill_for_key(key, self.ygg)
+            not_crawled = []
+
+        # ...and join them with node infos in one pass
+        peers = self.peers
+        self.enriched_peers = {
+            lookup.key: EnrichedPeerData.from_lookup(lookup, peers.get(lookup.key)) for lookup in lookups
+        }
+        return not_crawled
+
+    def publish(self, copy: bool = False) -> None:
+        """Publish current state as new snapshot. `copy` is for state, which is updated in-place (rolling crawl)"""
+        generation = self.snapshot.generation + 1
+        self.reports.append(self.recorder.report(generation, len(self.enriched_peers), len(self.peers)))
+        self.recorder.reset()
+
+        self.snapshot = Snapshot(
+            generation=generation,
+            peers=dict(self.peers) if copy else self.peers,
+            enriched_peers=self.enriched_peers,
+            peers_connections=dict(self.peers_connections) if copy else self.peers_connections,
+            reports=list(self.reports),
+        )
+        logger.info(f"Published snapshot #{self.snapshot.generation}: {len(self.enriched_peers)} nodes")
+
+        if settings.snapshot_path is not None:
+            from . import shared
+
+            # snapshot is published in this process anyway, web workers just keep serving previous one
+            try:
+                shared.write(self.snapshot, settings.snapshot_path)
+            except Exception as ex:
+                logger.error(f"Can't write shared snapshot #{self.snapshot.generation}: {ex!r}")
+
+    async def put_key_to_queue(self, key: Key, wait: bool = True) -> None:
+        """
+        Queue key for crawling. If queue is full, waits for free slot, or,
+        with `wait=False` (workers must not block on own queue), defers key until there is one.
+        """
         # don't put self to queue
         if key == self.self_info.key:
             return
@@ -200,8 +245,35 @@ class Crawler(AsyncContextManager):
         if key in self.key_locks:
             return
 
+        if not wait and self.keys_queue.full():
+            self.deferred_keys.add(key)
+            return
+
         await self.keys_queue.put(key)
 
+    def drain_deferred(self) -> None:
+        while self.deferred_keys and not self.keys_queue.full():
+            self.keys_queue.put_nowait(self.deferred_keys.pop())
+
+    def key_done(self) -> None:
+        """
+        Mark key from queue as done. Deferred keys are queued before that:
+        otherwise queue can be seen finished (and `join_queue` return) while they are waiting
+        """
+        self.drain_deferred()
+        self.keys_queue.task_done()
+
+    async def join_queue(self) -> None:
+        """Wait until all queued and deferred keys are crawled"""
+        while True:
+            await self.keys_queue.join()
+            if self.deferred_keys:
+                while self.deferred_keys:
+                    await self.keys_queue.put(self.deferred_keys.pop())
+            elif self.keys_queue.empty():
+                return
+            # else keys were queued after join() was woken up, wait for them too
+
     def crawling_status(self) -> None:
         def _format(self: asyncio.Queue):  # WTF: DITRY
             result = f"maxsize={self._maxsize!r}"  # type: ignore
@@ -217,6 +289,7 @@ class Crawler(AsyncContextManager):
 
         logger.info(f"Now in db: {len(self.peers)} peers, ")
         logger.info(f"Waiting for: {self.keys_queue.qsize()!r} in queue (and {_format(self.keys_queue)})")
+        logger.info(f"Deferred: {len(self.deferred_keys)} keys")
         for key in self.key_locks:
             if key not in self.peers:
                 logger.info(f"and for {key}")
@@ -230,18 +303,27 @@ class Crawler(AsyncContextManager):
 
                 # check and set lock
                 if self.key_locks.get(key, False):
-                    self.keys_queue.task_done()
+                    self.key_done()
                     continue
                 self.key_locks[key] = True
 
+                if self.shards is not None and (link := self.shards.owner(key)) is not None:
+                    # task_done() is called when shard sends result back
+                    link.dispatch(key)
+                    continue
+
                 await self.fill_for_key(key, ygg)
 
-                self.keys_queue.task_done()
+                self.key_done()
 
                 # logger.info(f"{key} done")
                 # self.waiting_for()
 
     async def fill_for_key(self, key: Key, ygg: Yggdrasil) -> None:
+        result = await self.crawl_key(key, ygg)
+        await self.merge_result(result, ygg)
+
+    async def crawl_key(self, key: Key, ygg: Yggdrasil) -> CrawlResult:
         try:
             _, raw_remote_peers = (await ygg.remote_get_peers(key)).popitem()
             _, raw_remote_trees = (await ygg.remote_get_tree(key)).popitem()
@@ -253,93 +335,32 @@ class Crawler(AsyncContextManager):
             remote_peers = []
             remote_trees = []
 
-        self.peers_connections[key] = remote_peers
-
-        # trees_list = self.trees_connections.setdefault(key, [])
-
         if key in remote_trees:
             remote_trees.remove(key)  # WTF: remove self tree
 
-        # trees_list.extend(remote_trees.keys)
+        return CrawlResult(
+            key=key,
+            peer=await self.remote_get_info(key, ygg),
+            peers=remote_peers,
+            trees=remote_trees,
+        )
 
-        peer_data = (await self.remote_get_info(key, ygg)) or PeerData(key=key)
+    async def merge_result(self, result: CrawlResult, ygg: Yggdrasil | None = None) -> None:
+        key = result.key
+        self.peers_connections[key] = result.peers
+
+        peer_data = result.peer or PeerData(key=key)
         self.peers[peer_data.key] = peer_data
 
-        for possible_key in remote_peers + remote_trees:
+        for possible_key in result.peers + result.trees:
             if ygg == self.ygg:
                 logger.info(f"WTF new leaf from {key = } going to recursion")
                 await self.fill_for_key(possible_key, ygg=ygg)
             else:
-                await self.put_key_to_queue(possible_key)
+                await self.put_key_to_queue(possible_key, wait=False)
 
     def export(self, mode: MODE) -> Export:
-        ret = Export()
-        nodes: dict[tuple[int, ...], EnrichedPeerData] = dict()
-
-        for info in self.enriched_peers.values():
-            nodes[info.tpath] = info
-
-        match mode:
-            case "path":
-                # TODO: this is copypasted from old cringe graph gen.
-                # make it normal
-                def resolve_parents(info: EnrichedPeerData):
-                    parent_coords = info.parent
-
-                    parent = EnrichedPeerData.empty(parent_coords)
-
-                    if parent.tpath not in nodes:
-                        nodes[parent.tpath] = parent
-
-                    if parent.path != parent.parent:
-                        resolve_parents(parent)
-
-                for info in self.enriched_peers.values():
-                    resolve_parents(info)
-
-                for node in nodes.values():
-                    if node.parent == node.path:
-                        continue
-
-                    e = nodes[tuple(node.parent)]
-                    to = e.id
-
-                    ret.edges.append(Export.Edge(from_=node.id, to=to))
-
-            case "peers":
-                for root_key, children in self.peers_connections.items():
-                    for child in children:
-                        edge = Export.Edge(
-                            from_=get_id(child),
-                            to=get_id(root_key),
-                        )
-                        ret.edges.append(edge)
-
-                        antiedge = Export.Edge(
-                            to=get_id(child),
-                            from_=get_id(root_key),
-                        )
-                        if edge in ret.edges and antiedge in ret.edges:
-                            ret.edges.remove(edge)
-                            ret.edges.remove(antiedge)
-                            edge.arrows = "to;from"
-                            ret.edges.append(edge)
-
-        for node in nodes.values():
-            cluster = node.cluster or node.name.rsplit(".", maxsplit=1)[0]
-            ret.clusters.add(cluster)
-
-            ret.nodes.append(
-                Export.Node(
-                    id=node.id,
-                    label=node.label,
-                    buildplatform=node.buildplatform,
-                    buildversion=node.buildversion,
-                    cluster=cluster,
-                )
-            )
-
-        return ret
+        return self.snapshot.export(mode)
 
     async def remote_get_info(self, key: Key, ygg: Yggdrasil) -> PeerData | None:
         try:
@@ -358,6 +379,7 @@ class Crawler(AsyncContextManager):
     async def __aenter__(self):
         self.ygg = await self.ygg.__aenter__()
         await self.init()
+        return self
 
     async def __aexit__(
         self,
@@ -365,8 +387,9 @@ class Crawler(AsyncContextManager):
         __exc_value: BaseException | None,
         __traceback: TracebackType | None,
     ) -> bool | None:
+        for worker in self.workers:
+            worker.cancel()
+        if self.shards is not None:
+            await self.shards.close()
         await self.ygg.__aexit__(__exc_type, __exc_value, __traceback)
         return None
-
-
-crawler = Crawler()
@@ -0,0 +1,148 @@
+"""Lookup structures for subgraph queries, built once per snapshot (see `Snapshot.index`)"""
+
+from collections import deque
+from functools import cached_property
+from typing import TYPE_CHECKING, Iterable
+
+from .models import EnrichedPeerData, NodeInfo, PeerData, get_id
+from .records import Record, Records, edge_record
+from .ygg import Key
+
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+Coords = tuple[int, ...]
+
+
+class GraphIndex:
+    snapshot: "Snapshot"
+
+    # key -> keys, which it reported in remotegetpeers
+    connections: dict[Key, set[Key]]
+    # undirected version of `connections`
+    adjacency: dict[Key, set[Key]]
+
+    # coordinate trie: every known coords (including placeholders, which have no node) -> child coords
+    by_path: dict[Coords, EnrichedPeerData]
+    children: dict[Coords, list[Coords]]
+
+    def __init__(self, snapshot: "Snapshot") -> None:
+        self.snapshot = snapshot
+
+        self.connections = {key: set(peers) for key, peers in snapshot.peers_connections.items()}
+        self.adjacency = {}
+        for key, peers in snapshot.peers_connections.items():
+            for peer in peers:
+                self.adjacency.setdefault(key, set()).add(peer)
+                self.adjacency.setdefault(peer, set()).add(key)
+
+        self.by_path = {info.tpath: info for info in snapshot.enriched_peers.values()}
+        self.children = {(): []}
+        for path in self.by_path:
+            # walk up until already known prefix: lookups can miss nodes in the middle of path
+            while path not in self.children:
+                self.children[path] = []
+                path = path[:-1]
+
+        for path in self.children:
+            if path:
+                self.children[path[:-1]].append(path)
+
+        for children in self.children.values():
+            children.sort()
+
+    @cached_property
+    def sizes(self) -> dict[Coords, int]:
+        """Number of coords in subtree, including itself"""
+        sizes: dict[Coords, int] = {}
+        for coords in sorted(self.children, key=len, reverse=True):
+            sizes[coords] = 1 + sum(sizes[child] for child in self.children[coords])
+        return sizes
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self.snapshot.enriched_peers or key in self.snapshot.peers
+
+    def node(self, key: Key) -> NodeInfo | None:
+        info: PeerData | None = self.snapshot.enriched_peers.get(key) or self.snapshot.peers.get(key)
+        if info is None:
+            return None
+
+        extra: dict = {
+            "id": get_id(key),
+            "label": info.name,
+            "peers": sorted(self.adjacency.get(key, ())),
+        }
+
+        if isinstance(info, EnrichedPeerData):
+            parent = self.by_path.get(info.tpath[:-1]) if info.path else None
+            extra |= {
+                "label": info.label,
+                "parent": parent.key if parent else None,
+                "children": self._keys(self.children.get(info.tpath, ())),
+            }
+
+        return NodeInfo.model_validate(info.model_dump() | extra)
+
+    def neighbors(self, key: Key, depth: int = 1) -> Records | None:
+        """Peers graph around `key`, up to `depth` hops"""
+        if key not in self:
+            return None
+
+        found = {key: 0}
+        queue = deque([key])
+        while queue:
+            current = queue.popleft()
+            if found[current] >= depth:
+                continue
+
+            for peer in self.adjacency.get(current, ()):
+                if peer not in found:
+                    found[peer] = found[current] + 1
+                    queue.append(peer)
+
+        # same edges, as in "peers" export: mutual connection is one "to;from" edge
+        edges: list[Record] = []
+        done: set[Key] = set()
+        for current in found:
+            done.add(current)
+            for peer in self.adjacency.get(current, ()):
+                if peer not in found or peer in done:
+                    continue
+
+                forward = peer in self.connections.get(current, ())
+                backward = current in self.connections.get(peer, ())
+                if forward and backward:
+                    edges.append(edge_record(get_id(current), get_id(peer), "to;from"))
+                elif forward:
+                    edges.append(edge_record(get_id(peer), get_id(current)))
+                else:
+                    edges.append(edge_record(get_id(current), get_id(peer)))
+
+        enriched = self.snapshot.enriched_peers
+        return Records.build((enriched[key] for key in found if key in enriched), edges)
+
+    def subtree(self, path: Iterable[int], depth: int | None = None) -> Records | None:
+        """Tree under coordinates `path`, with placeholders for unknown nodes, like in "path" export"""
+        root = tuple(path)
+        if root not in self.children:
+            return None
+
+        nodes: dict[Coords, EnrichedPeerData] = {}
+        edges: list[Record] = []
+
+        queue = deque([(root, 0)])
+        while queue:
+            coords, level = queue.popleft()
+            node = self.by_path.get(coords) or EnrichedPeerData.empty(coords)
+            nodes[coords] = node
+
+            if coords != root:
+                edges.append(edge_record(node.id, nodes[coords[:-1]].id))
+
+            if depth is None or level < depth:
+                queue.extend((child, level + 1) for child in self.children[coords])
+
+        return Records.build(nodes.values(), edges)
+
+    def _keys(self, coords: Iterable[Coords]) -> list[Key]:
+        return [self.by_path[c].key for c in coords if c in self.by_path and self.by_path[c].key]
@@ -0,0 +1,186 @@
+"""
+Level-of-detail export for big maps.
+
+Instead of every node, groups of nodes are sent as one super-node with `value` = group size,
+and edges between groups are merged into one edge with `value` = number of merged edges
+(merged edge is one-way, if all merged edges point the same way, and "to;from" otherwise):
+
+- "path" mode: subtrees deeper than `depth` are collapsed into their root node
+- "peers" mode: clusters with at least `min_cluster` nodes are collapsed into one node
+
+Every super-node has `expand` token. Client asks for the same export with this token in `expand`
+to get group members (and, in path mode, next level of subtrees) instead of super-node.
+
+Detail is fetched only by explicit expansion. Fetching by viewport is not done: layout is computed
+by the browser, so server doesn't know node positions.
+"""
+
+from typing import TYPE_CHECKING, Iterable
+
+from pydantic import BaseModel
+
+from .models import MODE, EnrichedPeerData, Export, NodeId, SortedSet, digest_id
+from .records import Record, edge_record, node_record
+
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+
+class LodExport(BaseModel):
+    class Node(Export.Node):
+        # number of nodes behind this node
+        value: int = 1
+        # token for `expand`, if this is super-node
+        expand: str | None = None
+
+    class Edge(Export.Edge):
+        # number of merged edges
+        value: int = 1
+
+    mode: MODE
+    depth: int
+    expanded: list[str] = []
+
+    nodes: list[Node] = []
+    edges: list[Edge] = []
+
+    clusters: SortedSet = set()
+
+
+def group_id(kind: str, name: str) -> NodeId:
+    return digest_id(f"{kind}:{name}")
+
+
+def parse_path(token: str) -> tuple[int, ...]:
+    return tuple(int(c) for c in token.replace(",", " ").split())
+
+
+def build_lod(snapshot: "Snapshot", mode: MODE, depth: int, expand: Iterable[str], min_cluster: int = 2) -> LodExport:
+    """Raises ValueError on bad `expand` token"""
+    expanded = sorted(set(expand))
+
+    clusters: set[str] = set()
+    paths: set[tuple[int, ...]] = set()
+    for token in expanded:
+        kind, _, name = token.partition(":")
+        match kind:
+            case "cluster":
+                clusters.add(name)
+            case "path":
+                paths.add(parse_path(name))
+            case _:
+                raise ValueError(f"Bad expand token: {token}")
+
+    match mode:
+        case "path":
+            nodes, edges = _subtrees(snapshot, depth, paths)
+        case "peers":
+            nodes, edges = _clusters(snapshot, clusters, min_cluster)
+
+    return LodExport(
+        mode=mode,
+        depth=depth,
+        expanded=expanded,
+        nodes=[LodExport.Node(**node) for node in nodes],
+        edges=[
+            LodExport.Edge(
+                from_=edge["from"],
+                to=edge["to"],
+                dashes=edge["dashes"],
+                arrows=edge["arrows"],
+                value=edge.get("value", 1),
+            )
+            for edge in edges
+        ],
+        clusters={node["cluster"] for node in nodes if node["cluster"] is not None},
+    )
+
+
+def _subtrees(snapshot: "Snapshot", depth: int, expanded: set[tuple[int, ...]]) -> tuple[list[Record], list[Record]]:
+    index = snapshot.index
+
+    nodes: dict[tuple[int, ...], Record] = {}
+    edges: list[Record] = []
+
+    stack: list[tuple[int, ...]] = [()]
+    while stack:
+        coords = stack.pop()
+        info = index.by_path.get(coords) or EnrichedPeerData.empty(coords)
+        record = node_record(info)
+
+        children = index.children[coords]
+        if len(coords) < depth or coords in expanded:
+            stack.extend(children)
+        elif children:
+            size = index.sizes[coords]
+            record |= {
+                "label": f"{record['label']} (+{size - 1})",
+                "value": size,
+                "expand": "path:" + ",".join(map(str, coords)),
+            }
+
+        nodes[coords] = record
+        if coords:
+            edges.append(edge_record(record["id"], nodes[coords[:-1]]["id"]))
+
+    return list(nodes.values()), edges
+
+
+def _clusters(snapshot: "Snapshot", expanded: set[str], min_cluster: int) -> tuple[list[Record], list[Record]]:
+    records = snapshot.records("peers")
+
+    members: dict[str, list[Record]] = {}
+    for node in records.nodes:
+        members.setdefault(node["cluster"], []).append(node)
+
+    nodes: list[Record] = []
+    # node id -> id of node, which represents it
+    representative: dict[NodeId, NodeId] = {}
+    for cluster, cluster_nodes in members.items():
+        if len(cluster_nodes) < min_cluster or cluster in expanded:
+            nodes.extend(cluster_nodes)
+            continue
+
+        super_id = group_id("cluster", cluster)
+        for node in cluster_nodes:
+            representative[node["id"]] = super_id
+
+        platforms = {node["buildplatform"] for node in cluster_nodes}
+        versions = {node["buildversion"] for node in cluster_nodes}
+        nodes.append(
+            {
+                "id": super_id,
+                "label": f"{cluster} ({len(cluster_nodes)})",
+                "buildplatform": platforms.pop() if len(platforms) == 1 else "mixed",
+                "buildversion": versions.pop() if len(versions) == 1 else "mixed",
+                "cluster": cluster,
+                "value": len(cluster_nodes),
+                "expand": f"cluster:{cluster}",
+            }
+        )
+
+    edges: list[Record] = []
+    merged: dict[tuple[NodeId, NodeId], Record] = {}
+    for edge in records.edges:
+        from_ = representative.get(edge["from"], edge["from"])
+        to = representative.get(edge["to"], edge["to"])
+        if from_ == edge["from"] and to == edge["to"]:
+            edges.append(edge)
+            continue
+
+        if from_ == to:
+            # edge inside collapsed cluster
+            continue
+
+        pair = (min(from_, to), max(from_, to))
+        if pair not in merged:
+            merged[pair] = edge_record(from_, to, edge["arrows"]) | {"value": 1}
+            continue
+
+        record = merged[pair]
+        record["value"] += 1
+        if edge["arrows"] is not None or (record["from"], record["to"]) != (from_, to):
+            record["arrows"] = "to;from"
+
+    edges.extend(merged.values())
+    return nodes, edges
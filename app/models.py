@@ -0,0 +1,172 @@
+import hashlib
+import sys
+from functools import cached_property
+from typing import Annotated, Any, Literal, NewType, Self, TypeAlias
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, PlainSerializer
+
+from .ygg import Addr, EmptyKey, Key, LookupsResponse
+
+UNK = "unknown"
+
+NodeId = NewType("NodeId", int)
+MODE: TypeAlias = Literal["path"] | Literal["peers"]
+
+# for values, which repeat across nodes (build info), so every node doesn't keep own copy
+Interned = Annotated[str, AfterValidator(sys.intern)]
+# set, serialized in same order by every process (order of set depends on string hashes)
+SortedSet = Annotated[set[str], PlainSerializer(sorted, return_type=list[str])]
+
+
+def get_id(key: Key) -> NodeId:
+    return NodeId(int(key, 16))
+
+
+def digest_id(text: str) -> NodeId:
+    """Id of node, which has no key. Stable between processes, unlike hash()"""
+    return NodeId(int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big"))
+
+
+# `NodeModel.from_fields` fills instance slots itself, same as `model_construct` of pydantic 2 does.
+# If pydantic lays out instances differently, it just calls `model_construct`
+_direct_construct = set(BaseModel.__slots__) == {
+    "__dict__",
+    "__pydantic_fields_set__",
+    "__pydantic_extra__",
+    "__pydantic_private__",
+}
+
+
+class NodeModel(BaseModel):
+    """Base for models, which are kept for every node"""
+
+    @classmethod
+    def from_fields(cls: type[Self], fields: dict[str, Any]) -> Self:
+        """
+        Instance from values of all fields, which are valid already (e.g. taken from other models).
+        Same as `model_construct`, but without its per-field work (aliases, defaults), which is slower
+        than validation itself. Only for models without aliases, private attributes and extra fields
+        """
+        if not _direct_construct:
+            return cls.model_construct(set(fields), **fields)
+
+        node = cls.__new__(cls)
+        object.__setattr__(node, "__dict__", fields)
+        object.__setattr__(node, "__pydantic_fields_set__", set(fields))
+        object.__setattr__(node, "__pydantic_extra__", None)
+        object.__setattr__(node, "__pydantic_private__", None)
+        return node
+
+
+class PeerData(NodeModel):
+    key: Key
+
+    name: str = UNK
+
+    buildname: Interned = UNK
+    buildversion: Interned = UNK
+
+    buildarch: Interned = UNK
+    buildplatform: Interned = UNK
+
+    cluster: Interned | None = None
+
+
+class EnrichedPeerData(PeerData):
+    addr: Addr
+    key: Key | EmptyKey
+
+    path: tuple[int, ...]
+
+    # derived values are cached: they are used for every node on every export.
+    # Fields can't be assigned, and copies drop the cache (see `model_copy`), so it can't go stale
+    model_config = ConfigDict(frozen=True)
+
+    @cached_property
+    def label(self) -> str:
+        return f"{self.name} - {self.addr[:8]}"
+
+    @cached_property
+    def parent(self) -> tuple[int, ...]:
+        return self.path[:-1]
+
+    @property
+    def tpath(self) -> tuple[int, ...]:
+        return self.path
+
+    @cached_property
+    def id(self) -> NodeId:
+        if self.key != "":
+            return get_id(self.key)
+        else:
+            # web workers compute placeholders on their own, ids must match ids in published `/state`
+            return digest_id(f"placeholder:{self.addr}:{self.name}:{','.join(map(str, self.path))}")
+
+    def model_copy(self, *, update: dict[str, Any] | None = None, deep: bool = False) -> Self:
+        copy = super().model_copy(update=update, deep=deep)
+        for name in ("label", "parent", "id"):
+            copy.__dict__.pop(name, None)
+        return copy
+
+    @classmethod
+    def from_lookup(cls: type[Self], lookup: LookupsResponse.Lookup, peer: PeerData | None) -> Self:
+        """Join lookup with node info. Both are validated already, so result is not validated again"""
+        peer = peer or PeerData(key=lookup.key)
+        return cls.from_fields(peer.__dict__ | {"addr": lookup.addr, "key": lookup.key, "path": lookup.path})
+
+    @classmethod
+    def empty(cls: type[Self], path: tuple[int, ...]) -> Self:
+        # not validated, so placeholder shares `path` tuple with its child
+        return cls.model_construct(
+            addr=Addr(""),
+            key=EmptyKey(""),
+            path=path,
+        )
+
+
+class CrawlResult(NodeModel):
+    """Everything one crawled key told us. Shard workers send these to the coordinator."""
+
+    key: Key
+
+    # None if getnodeinfo failed
+    peer: PeerData | None = None
+
+    peers: list[Key] = []
+    trees: list[Key] = []
+
+
+class NodeInfo(PeerData):
+    id: NodeId
+    label: str
+
+    # None if node was crawled, but not found in lookups
+    addr: Addr | None = None
+    path: list[int] | None = None
+
+    # tree neighbours by coordinates; None if parent is unknown (placeholder) node
+    parent: Key | None = None
+    children: list[Key] = []
+
+    peers: list[Key] = []
+
+
+class Export(BaseModel):
+    class Node(BaseModel):
+        id: NodeId
+        label: str
+        buildplatform: str = UNK
+        buildversion: str = UNK
+        cluster: str | None = None
+
+    class Edge(BaseModel):
+        from_: NodeId = Field(serialization_alias="from")
+        to: NodeId
+
+        dashes: bool = False
+        arrows: Literal["to"] | Literal["from"] | Literal["to;from"] | str | None = None
+
+    nodes: list[Node] = []
+    edges: list[Edge] = []
+
+    clusters: SortedSet = set()
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Allows `rate` tokens per second on average, with bursts up to `burst` tokens. Waiters are served in FIFO order"""
+
+    rate: float
+    capacity: float
+
+    tokens: float
+    updated: float
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        assert tokens <= self.capacity
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class RemoteLimiter:
+    """
+    Limits for remote requests: one bucket for all requests, one per request type and one per remote key.
+    Rate 0 means no limit. Buckets of keys are created on demand and dropped when idle.
+    """
+
+    total: TokenBucket | None
+    types: dict[str, TokenBucket]
+
+    key_rate: float
+    key_burst: float
+    keys: dict[str, TokenBucket]
+
+    # prune idle key buckets when there are more of them
+    max_idle_keys = 1024
+
+    def __init__(
+        self,
+        rate: float = 0,
+        type_rates: dict[str, float] = {},
+        key_rate: float = 0,
+        key_burst: float | None = None,
+    ) -> None:
+        self.total = TokenBucket(rate) if rate > 0 else None
+        self.types = {request: TokenBucket(rate) for request, rate in type_rates.items() if rate > 0}
+
+        self.key_rate = key_rate
+        self.key_burst = key_burst or max(key_rate, 1.0)
+        self.keys = {}
+
+    async def acquire(self, request: str, key: str | None = None) -> None:
+        # most specific first, so request waiting for its key doesn't hold global tokens
+        if self.key_rate > 0 and key:
+            if key not in self.keys:
+                if len(self.keys) >= self.max_idle_keys:
+                    self._prune()
+                self.keys[key] = TokenBucket(self.key_rate, self.key_burst)
+            await self.keys[key].acquire()
+
+        if request in self.types:
+            await self.types[request].acquire()
+
+        if self.total is not None:
+            await self.total.acquire()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key, bucket in list(self.keys.items()):
+            refilled = bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.capacity
+            if refilled and not bucket._lock.locked():
+                del self.keys[key]
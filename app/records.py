@@ -0,0 +1,69 @@
+"""Export as plain dicts (keys are same as in `Export` json), without pydantic objects"""
+
+import sys
+from typing import Any, Iterable, NamedTuple, TypeAlias
+
+from .models import EnrichedPeerData, Export, NodeId, PeerData, get_id
+
+Record: TypeAlias = dict[str, Any]
+
+
+class Records(NamedTuple):
+    nodes: list[Record]
+    edges: list[Record]
+    clusters: set[str]
+
+    # node keys, same order as `nodes`; empty for path placeholders
+    keys: list[str]
+
+    @classmethod
+    def build(cls, nodes: Iterable[EnrichedPeerData], edges: list[Record]) -> "Records":
+        records = cls(nodes=[], edges=edges, clusters=set(), keys=[])
+        for node in nodes:
+            record = node_record(node)
+            records.clusters.add(record["cluster"])
+
+            records.nodes.append(record)
+            records.keys.append(node.key)
+
+        return records
+
+    def to_export(self) -> Export:
+        return Export(
+            nodes=[Export.Node(**node) for node in self.nodes],
+            edges=[
+                Export.Edge(from_=edge["from"], to=edge["to"], dashes=edge["dashes"], arrows=edge["arrows"])
+                for edge in self.edges
+            ],
+            clusters=self.clusters,
+        )
+
+
+def node_record(node: EnrichedPeerData) -> Record:
+    return {
+        "id": node.id,
+        "label": node.label,
+        "buildplatform": node.buildplatform,
+        "buildversion": node.buildversion,
+        "cluster": node_cluster(node),
+    }
+
+
+def peer_record(peer: PeerData) -> Record:
+    """Same for crawled node, which is not in lookups (so it has no address and coordinates)"""
+    return {
+        "id": get_id(peer.key),
+        "label": peer.name,
+        "buildplatform": peer.buildplatform,
+        "buildversion": peer.buildversion,
+        "cluster": node_cluster(peer),
+    }
+
+
+def node_cluster(node: PeerData) -> str:
+    """Explicit cluster of node, or its name without last part (`a.b.c` -> `a.b`)"""
+    return node.cluster or sys.intern(node.name.rsplit(".", maxsplit=1)[0])
+
+
+def edge_record(from_: NodeId, to: NodeId, arrows: str | None = None) -> Record:
+    return {"from": from_, "to": to, "dashes": False, "arrows": arrows}
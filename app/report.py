@@ -0,0 +1,180 @@
+"""
+Crawl report: what crawl of one generation cost. Remote requests of crawler's clients are recorded
+(`Yggdrasil.recorder`) and summarized, when snapshot is published (see `Crawler.publish`).
+In rolling mode report covers time since previous publish. Requests, done by shard workers, are not seen here.
+"""
+
+import datetime
+import time
+from typing import Literal
+
+from pydantic import BaseModel
+
+from .config import settings
+from .ygg import ErrorResponse, Key, RequestError
+
+KIND = Literal["full", "partial", "rolling"]
+
+# upper bounds of latency histogram buckets, ms
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Latency(BaseModel):
+    """Seconds"""
+
+    count: int = 0
+    mean: float = 0
+    p50: float = 0
+    p90: float = 0
+    p99: float = 0
+    max: float = 0
+
+    # "<=100ms" -> requests, which took from previous bucket bound to 100ms
+    histogram: dict[str, int] = {}
+
+    @classmethod
+    def of(cls, seconds: list[float]) -> "Latency":
+        if not seconds:
+            return cls()
+
+        seconds = sorted(seconds)
+
+        def percentile(p: float) -> float:
+            return seconds[min(len(seconds) - 1, int(len(seconds) * p))]
+
+        histogram = {f"<={bound}ms": 0 for bound in BUCKETS} | {f">{BUCKETS[-1]}ms": 0}
+        for value in seconds:
+            ms = value * 1000
+            bucket = next((f"<={bound}ms" for bound in BUCKETS if ms <= bound), f">{BUCKETS[-1]}ms")
+            histogram[bucket] += 1
+
+        return cls(
+            count=len(seconds),
+            mean=sum(seconds) / len(seconds),
+            p50=percentile(0.5),
+            p90=percentile(0.9),
+            p99=percentile(0.99),
+            max=seconds[-1],
+            histogram={bucket: count for bucket, count in histogram.items() if count},
+        )
+
+
+class RequestStats(BaseModel):
+    count: int
+    errors: int
+    latency: Latency
+
+
+class SlowKey(BaseModel):
+    key: Key
+    # total time of its requests
+    seconds: float
+    requests: int
+
+
+class FailingKey(BaseModel):
+    key: Key
+    # request -> error
+    errors: dict[str, str]
+
+
+class CrawlReport(BaseModel):
+    generation: int
+    kind: KIND
+
+    started: datetime.datetime
+    finished: datetime.datetime
+    wall_seconds: float
+
+    # nodes in snapshot (from lookups) and crawled ones
+    nodes: int
+    crawled: int
+
+    requests: dict[str, RequestStats]
+    latency: Latency
+
+    # top `report_top` keys
+    slowest: list[SlowKey]
+    failing: list[FailingKey]
+    failing_count: int
+
+    # found in lookups, but not crawled; if `reloaded`, they were crawled after all (`reload_bad`)
+    not_crawled: list[Key]
+    reloaded: bool
+
+
+def describe(ex: BaseException) -> str:
+    if isinstance(ex, RequestError) and ex.args and isinstance(ex.args[0], ErrorResponse):
+        return ex.args[0].error
+    return repr(ex)
+
+
+class CrawlRecorder:
+    kind: KIND
+    started: datetime.datetime
+    _started: float
+
+    # (request, key, seconds, error)
+    requests: list[tuple[str, Key | None, float, str | None]]
+
+    not_crawled: list[Key]
+    reloaded: bool
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self, kind: KIND = "rolling") -> None:
+        self.kind = kind
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self._started = time.perf_counter()
+
+        self.requests = []
+        self.not_crawled = []
+        self.reloaded = False
+
+    def record(self, request: str, key: Key | None, seconds: float, error: BaseException | None) -> None:
+        self.requests.append((request, key, seconds, describe(error) if error is not None else None))
+
+    def report(self, generation: int, nodes: int, crawled: int) -> CrawlReport:
+        by_request: dict[str, list[float]] = {}
+        errors_by_request: dict[str, int] = {}
+        by_key: dict[Key, list[float]] = {}
+        failing: dict[Key, dict[str, str]] = {}
+
+        for request, key, seconds, error in self.requests:
+            by_request.setdefault(request, []).append(seconds)
+            if error is not None:
+                errors_by_request[request] = errors_by_request.get(request, 0) + 1
+            if key is None:
+                continue
+
+            by_key.setdefault(key, []).append(seconds)
+            if error is not None:
+                failing.setdefault(key, {})[request] = error
+
+        slowest = sorted(by_key.items(), key=lambda item: sum(item[1]), reverse=True)[: settings.report_top]
+        most_failing = sorted(failing.items(), key=lambda item: len(item[1]), reverse=True)[: settings.report_top]
+
+        return CrawlReport(
+            generation=generation,
+            kind=self.kind,
+            started=self.started,
+            finished=datetime.datetime.now(datetime.timezone.utc),
+            wall_seconds=time.perf_counter() - self._started,
+            nodes=nodes,
+            crawled=crawled,
+            requests={
+                request: RequestStats(
+                    count=len(seconds),
+                    errors=errors_by_request.get(request, 0),
+                    latency=Latency.of(seconds),
+                )
+                for request, seconds in sorted(by_request.items())
+            },
+            latency=Latency.of([seconds for _, _, seconds, _ in self.requests]),
+            slowest=[SlowKey(key=key, seconds=sum(seconds), requests=len(seconds)) for key, seconds in slowest],
+            failing=[FailingKey(key=key, errors=errors) for key, errors in most_failing],
+            failing_count=len(failing),
+            not_crawled=self.not_crawled,
+            reloaded=self.reloaded,
+        )
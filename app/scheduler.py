@@ -0,0 +1,141 @@
+"""
+Rolling crawl: instead of full sweep every `refresh_seconds`, every known node is re-probed
+once per `freshness_seconds`, with probes spread evenly over time. Crawler workers do the probing,
+and `rpc_rate` limits overlay requests of all of them. Snapshot is published every `publish_seconds`.
+"""
+
+import asyncio
+import heapq
+import random
+import time
+
+from loguru import logger
+
+from .config import settings
+from .crawler import Crawler
+from .ygg import Key
+
+# remote requests per probe: remotegetpeers, remotegettree and getnodeinfo
+RPCS_PER_PROBE = 3
+
+
+class RollingScheduler:
+    crawler: Crawler
+
+    # heap of (due time, key); entries, which don't match `scheduled`, are stale
+    due: list[tuple[float, Key]]
+    scheduled: dict[Key, float]
+
+    # key -> last probe time
+    probed: dict[Key, float]
+
+    def __init__(self, crawler: Crawler) -> None:
+        self.crawler = crawler
+        self.due = []
+        self.scheduled = {}
+        self.probed = {}
+
+    def schedule(self, key: Key, at: float) -> None:
+        if key == self.crawler.self_info.key or key in self.scheduled:
+            return
+
+        self.scheduled[key] = at
+        heapq.heappush(self.due, (at, key))
+
+    def forget(self, key: Key) -> None:
+        self.scheduled.pop(key, None)
+        self.probed.pop(key, None)
+
+    async def run(self) -> None:
+        async with self.crawler.refresh_lock:
+            self.crawler.reset()
+            await self.crawler.fill_self()
+
+        now = time.monotonic()
+        for key in await self.crawler.root_keys():
+            self.schedule(key, now)
+
+        publisher = asyncio.create_task(self.publisher())
+        try:
+            await self.prober()
+        finally:
+            publisher.cancel()
+
+    async def prober(self) -> None:
+        while True:
+            if not self.due:
+                await asyncio.sleep(1)
+                continue
+
+            at, key = self.due[0]
+            delay = at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(min(delay, 1))
+                continue
+
+            heapq.heappop(self.due)
+            if self.scheduled.get(key) != at:
+                continue
+            del self.scheduled[key]
+
+            await self.probe(key)
+
+    async def probe(self, key: Key) -> None:
+        now = time.monotonic()
+        self.probed[key] = now
+        self.schedule(key, now + settings.freshness_seconds)
+
+        # let worker crawl it again
+        self.crawler.key_locks.pop(key, None)
+        await self.crawler.keys_queue.put(key)
+
+    async def publisher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.publish_seconds)
+            try:
+                await self.publish()
+            except Exception as ex:
+                logger.warning(f"Rolling publish exc: {ex!r}")
+
+    async def publish(self) -> None:
+        crawler = self.crawler
+        now = time.monotonic()
+
+        for key in await crawler.root_keys():
+            if key not in self.probed:
+                self.schedule(key, now)
+
+        # keys, which workers found by themselves, were just crawled: re-probe them at random phase
+        for key in crawler.peers:
+            if key not in self.probed and key not in self.scheduled:
+                self.probed[key] = now
+                self.schedule(key, now + random.uniform(0, settings.freshness_seconds))
+
+        async with crawler.refresh_lock:
+            for key in await crawler.merge_lookups(reload_bad=False):
+                if key not in self.probed:
+                    self.schedule(key, now)
+
+            self.prune()
+            crawler.publish(copy=True)
+
+        stale = sum(1 for probed in self.probed.values() if now - probed > settings.freshness_seconds)
+        logger.info(f"Rolling crawl: {len(self.probed)} nodes, {stale} stale, {len(self.scheduled)} scheduled")
+
+        needed_rate = RPCS_PER_PROBE * len(self.probed) / settings.freshness_seconds
+        if 0 < settings.rpc_rate < needed_rate:
+            logger.warning(f"rpc_rate={settings.rpc_rate} is too low for freshness, need {needed_rate:.1f}")
+
+    def prune(self) -> None:
+        """Forget nodes, which are not in lookups and nobody has in peers anymore"""
+        crawler = self.crawler
+
+        alive = set(crawler.enriched_peers) | {crawler.self_info.key}
+        for connections in crawler.peers_connections.values():
+            alive.update(connections)
+
+        for key in [key for key in crawler.peers if key not in alive]:
+            logger.info(f"{key} is gone")
+            crawler.peers.pop(key, None)
+            crawler.peers_connections.pop(key, None)
+            self.forget(key)
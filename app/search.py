@@ -0,0 +1,232 @@
+"""
+Search over snapshot nodes, built once per snapshot (see `Snapshot.search`).
+
+Query is whitespace-separated terms, all of them must match:
+
+- `term` - substring of name, key or addr (prefix matches go first)
+- `field=value` - exact match, `field=value*` - prefix match
+- `field~value` - substring, `field!=value` - not equal
+- `field<value`, `field<=value`, `field>value`, `field>=value` - comparison,
+  `buildversion` is compared as version (`0.4.10 > 0.4.9`)
+
+Fields: name, key, addr, cluster, buildname, buildversion, buildarch, buildplatform.
+Everything is case-insensitive.
+"""
+
+import re
+import sys
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from pydantic import BaseModel
+
+from .models import EnrichedPeerData, NodeId
+from .records import Records, node_cluster
+from .ygg import Addr, Key
+
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+FIELDS = ("name", "key", "addr", "cluster", "buildname", "buildversion", "buildarch", "buildplatform")
+
+# fields with few distinct values, which get value -> nodes map
+CATEGORICAL = ("cluster", "buildname", "buildversion", "buildarch", "buildplatform")
+
+# fields, which get sorted column for prefix search
+PREFIXED = ("name", "key", "addr")
+
+_term_re = re.compile(r"^(?P<field>[a-z]+)(?P<op>!=|<=|>=|=|~|<|>)(?P<value>.*)$")
+_number_re = re.compile(r"\d+")
+
+
+class SearchResult(BaseModel):
+    class Node(BaseModel):
+        id: NodeId
+        key: Key | str
+        label: str
+        name: str
+        addr: Addr
+        buildversion: str
+        buildplatform: str
+
+    query: str
+    count: int
+
+    # ids of all found nodes, for highlighting
+    ids: list[NodeId]
+    # first `limit` found nodes
+    nodes: list[Node]
+
+
+def _lower(value: str, intern: bool) -> str:
+    """`value.lower()`, but values, which are lowercase already (keys, most names), are not copied"""
+    lowered = value.lower()
+    if intern:
+        return sys.intern(lowered)
+    return value if lowered == value else lowered
+
+
+def version(value: str) -> tuple[int, ...]:
+    return tuple(int(n) for n in _number_re.findall(value))
+
+
+class SearchIndex:
+    snapshot: "Snapshot"
+
+    nodes: list[EnrichedPeerData]
+    columns: dict[str, list[str]]
+
+    # field -> sorted (value, node index)
+    prefixes: dict[str, list[tuple[str, int]]]
+    # field -> value -> node indexes
+    values: dict[str, dict[str, list[int]]]
+
+    # "name\0key\0addr" for substring search of bare terms
+    haystack: list[str]
+
+    def __init__(self, snapshot: "Snapshot") -> None:
+        self.snapshot = snapshot
+        self.nodes = list(snapshot.enriched_peers.values())
+
+        self.columns = {field: [] for field in FIELDS}
+        for node in self.nodes:
+            cluster = node_cluster(node)
+            for field in FIELDS:
+                value = cluster if field == "cluster" else getattr(node, field)
+                self.columns[field].append(_lower(value, field in CATEGORICAL))
+
+        self.prefixes = {field: sorted((value, i) for i, value in enumerate(self.columns[field])) for field in PREFIXED}
+
+        self.values = {}
+        for field in CATEGORICAL:
+            by_value = self.values[field] = {}
+            for i, value in enumerate(self.columns[field]):
+                by_value.setdefault(value, []).append(i)
+
+        self.haystack = ["\0".join(values) for values in zip(*(self.columns[field] for field in PREFIXED))]
+
+    def search(self, query: str) -> list[EnrichedPeerData]:
+        """Nodes matching every term of query. Raises ValueError on bad query"""
+        candidates: list[int] | None = None
+        checks: list[Callable[[int], bool]] = []
+
+        for term in query.lower().split():
+            match = _term_re.match(term)
+            if match is None:
+                candidates = self._intersect(candidates, self._bare(term))
+                continue
+
+            field, op, value = match.group("field", "op", "value")
+            if field not in FIELDS:
+                raise ValueError(f"Unknown field: {field}")
+
+            indexed = self._indexed(field, op, value)
+            if indexed is not None:
+                candidates = self._intersect(candidates, indexed)
+            else:
+                checks.append(self._check(field, op, value))
+
+        if candidates is None:
+            candidates = list(range(len(self.nodes)))
+
+        return [self.nodes[i] for i in candidates if all(check(i) for check in checks)]
+
+    def result(self, query: str, limit: int) -> SearchResult:
+        found = self.search(query)
+        return SearchResult(
+            query=query,
+            count=len(found),
+            ids=[node.id for node in found],
+            nodes=[
+                SearchResult.Node(
+                    id=node.id,
+                    key=node.key,
+                    label=node.label,
+                    name=node.name,
+                    addr=node.addr,
+                    buildversion=node.buildversion,
+                    buildplatform=node.buildplatform,
+                )
+                for node in found[:limit]
+            ],
+        )
+
+    def records(self, query: str, records: Records) -> Records:
+        """Filter export `records` to found nodes and edges between them"""
+        ids = {node.id for node in self.search(query)}
+
+        filtered = Records(nodes=[], edges=[], clusters=set(), keys=[])
+        for node, key in zip(records.nodes, records.keys):
+            if node["id"] in ids:
+                filtered.nodes.append(node)
+                filtered.keys.append(key)
+                filtered.clusters.add(node["cluster"])
+        filtered.edges.extend(edge for edge in records.edges if edge["from"] in ids and edge["to"] in ids)
+        return filtered
+
+    def _bare(self, term: str) -> list[int]:
+        prefixed: dict[int, None] = {}
+        for field in PREFIXED:
+            prefixed.update(dict.fromkeys(self._prefix(field, term)))
+
+        return list(prefixed) + [i for i, text in enumerate(self.haystack) if term in text and i not in prefixed]
+
+    def _prefix(self, field: str, prefix: str) -> Iterable[int]:
+        column = self.prefixes[field]
+        for value, i in column[bisect_left(column, (prefix, -1)) :]:
+            if not value.startswith(prefix):
+                break
+            yield i
+
+    def _indexed(self, field: str, op: str, value: str) -> list[int] | None:
+        """Node indexes from prebuilt index, or None if term should be checked node by node"""
+        if op != "=":
+            return None
+
+        if value.endswith("*") and field in PREFIXED:
+            return sorted(self._prefix(field, value[:-1]))
+
+        if field in CATEGORICAL and not value.endswith("*"):
+            return self.values[field].get(value, [])
+
+        return None
+
+    def _check(self, field: str, op: str, value: str) -> Callable[[int], bool]:
+        column = self.columns[field]
+
+        if op == "=" and value.endswith("*"):
+            prefix = value[:-1]
+            return lambda i: column[i].startswith(prefix)
+
+        match op:
+            case "=":
+                return lambda i: column[i] == value
+            case "!=":
+                return lambda i: column[i] != value
+            case "~":
+                return lambda i: value in column[i]
+
+        key: Callable[[str], tuple[int, ...] | str] = version if field == "buildversion" else str
+        bound = key(value)
+        if field == "buildversion" and not bound:
+            raise ValueError(f"Bad version: {value}")
+
+        compare: Callable[[tuple[int, ...] | str], bool] = {
+            "<": lambda v: v < bound,  # type: ignore
+            "<=": lambda v: v <= bound,  # type: ignore
+            ">": lambda v: v > bound,  # type: ignore
+            ">=": lambda v: v >= bound,  # type: ignore
+        }[op]
+
+        def check(i: int) -> bool:
+            v = key(column[i])
+            return bool(v) and compare(v)
+
+        return check
+
+    @staticmethod
+    def _intersect(candidates: list[int] | None, found: list[int]) -> list[int]:
+        if candidates is None:
+            return found
+        allowed = set(found)
+        return [i for i in candidates if i in allowed]
@@ -0,0 +1,282 @@
+"""
+Crawl sharding across several processes.
+
+Key space is split by `get_id(key) % settings.shards`. Shard 0 is the coordinator: usual web app
+with its own crawler, which listens on `settings.shard_address`. Every other shard is started with
+
+    SHARDS=3 SHARD_INDEX=1 SHARD_ADDRESS=127.0.0.1:9100 python -m app.shard
+
+connects to coordinator, crawls keys it owns with its own workers and yggdrasil sockets,
+and sends back `CrawlResult`s. Coordinator merges results, routes discovered keys
+and publishes single snapshot. Keys of disconnected shards, keys, which shard didn't answer
+within `settings.shard_timeout`, and keys of shards with `settings.queue_size` unanswered keys
+are crawled by coordinator itself.
+"""
+
+import asyncio
+import time
+from asyncio import StreamReader, StreamWriter
+from pathlib import Path
+from typing import Annotated, Callable, Coroutine, Literal
+
+import pydantic_core
+from loguru import logger
+from pydantic import BaseModel, Field, TypeAdapter
+
+from .config import settings
+from .crawler import Crawler
+from .models import CrawlResult, get_id
+from .ygg import Key, Yggdrasil
+
+try:
+    from asyncio import open_unix_connection, start_unix_server  # type: ignore
+except ImportError:
+    logger.warning("unix sockets unavailable (it's okay, if you on windows)")
+
+LIMIT = 2**32
+
+
+def shard_of(key: Key, shards: int | None = None) -> int:
+    return get_id(key) % (shards or settings.shards)
+
+
+class Hello(BaseModel):
+    op: Literal["hello"] = "hello"
+    shard: int
+
+
+class Crawl(BaseModel):
+    op: Literal["crawl"] = "crawl"
+    key: Key
+
+
+class Result(BaseModel):
+    op: Literal["result"] = "result"
+    result: CrawlResult
+
+
+Message = Annotated[Hello | Crawl | Result, Field(discriminator="op")]
+message_adapter: TypeAdapter[Hello | Crawl | Result] = TypeAdapter(Message)
+
+
+def encode(msg: BaseModel) -> bytes:
+    return msg.model_dump_json().encode() + b"\n"
+
+
+def _is_tcp(address: str) -> bool:
+    return ":" in address
+
+
+async def open_stream(address: str) -> tuple[StreamReader, StreamWriter]:
+    if _is_tcp(address):
+        host, port = address.rsplit(":", 1)
+        return await asyncio.open_connection(host=host, port=int(port), limit=LIMIT)
+    return await open_unix_connection(Path(address), limit=LIMIT)
+
+
+async def start_stream_server(
+    handler: Callable[[StreamReader, StreamWriter], Coroutine],
+    address: str,
+) -> asyncio.Server:
+    if _is_tcp(address):
+        host, port = address.rsplit(":", 1)
+        return await asyncio.start_server(handler, host=host, port=int(port), limit=LIMIT)
+
+    path = Path(address)
+    path.unlink(missing_ok=True)
+    return await start_unix_server(handler, path, limit=LIMIT)
+
+
+class ShardLink:
+    index: int
+    writer: StreamWriter
+
+    # keys sent to shard and not answered yet -> deadline (monotonic)
+    pending: dict[Key, float]
+
+    def __init__(self, index: int, writer: StreamWriter) -> None:
+        self.index = index
+        self.writer = writer
+        self.pending = {}
+
+    def full(self) -> bool:
+        """
+        Shard has `settings.queue_size` unanswered keys. It stops reading, when its queue is full,
+        so more keys would only pile up in connection buffers
+        """
+        return 0 < settings.queue_size <= len(self.pending)
+
+    def dispatch(self, key: Key) -> None:
+        self.pending[key] = time.monotonic() + settings.shard_timeout
+        self.writer.write(encode(Crawl(key=key)))
+
+
+class ShardServer:
+    """Coordinator side: accepts shard workers and feeds them with keys from crawler queue."""
+
+    crawler: Crawler
+    links: dict[int, ShardLink]
+
+    # keys, which shards didn't answer in time; crawled locally until `reset()`
+    expired: set[Key]
+
+    server: asyncio.Server | None
+    watchdog: asyncio.Task | None
+
+    def __init__(self, crawler: Crawler) -> None:
+        self.crawler = crawler
+        self.links = {}
+        self.expired = set()
+        self.server = None
+        self.watchdog = None
+
+    async def start(self) -> None:
+        assert settings.shard_address
+        self.server = await start_stream_server(self.handle, settings.shard_address)
+        self.watchdog = asyncio.create_task(self.expire())
+        logger.info(f"Waiting for {settings.shards - 1} shards on {settings.shard_address}")
+
+    async def close(self) -> None:
+        if self.watchdog is not None:
+            self.watchdog.cancel()
+        if self.server is not None:
+            self.server.close()
+        for link in list(self.links.values()):
+            link.writer.close()
+
+    def reset(self) -> None:
+        """New crawl: give shards another chance with keys, which they didn't answer before"""
+        self.expired = set()
+
+    def owner(self, key: Key) -> ShardLink | None:
+        """Connected shard, which owns key and can take it, or None if key should be crawled locally"""
+        index = shard_of(key)
+        if index == settings.shard_index or key in self.expired:
+            return None
+
+        link = self.links.get(index)
+        if link is None or link.full():
+            return None
+        return link
+
+    async def handle(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            hello = message_adapter.validate_json(await reader.readline())
+        except pydantic_core.ValidationError as ex:
+            logger.warning(f"Bad shard hello: {ex!r}")
+            writer.close()
+            return
+
+        if not isinstance(hello, Hello) or not 0 < hello.shard < settings.shards or hello.shard in self.links:
+            logger.warning(f"Rejecting shard: {hello}")
+            writer.close()
+            return
+
+        link = ShardLink(hello.shard, writer)
+        self.links[link.index] = link
+        logger.info(f"Shard {link.index} connected")
+
+        try:
+            while line := await reader.readline():
+                msg = message_adapter.validate_json(line)
+                if isinstance(msg, Result) and msg.result.key in self.expired:
+                    logger.info(f"Late result from shard {link.index} for {msg.result.key}, it is crawled locally")
+                    continue
+                if not isinstance(msg, Result) or msg.result.key not in link.pending:
+                    logger.warning(f"Unexpected message from shard {link.index}: {msg}")
+                    continue
+
+                del link.pending[msg.result.key]
+                await self.crawler.merge_result(msg.result)
+                self.crawler.key_done()
+        except (ConnectionError, pydantic_core.ValidationError) as ex:
+            logger.warning(f"Shard {link.index} -> {ex!r}")
+        finally:
+            del self.links[link.index]
+            writer.close()
+            self.requeue(link, list(link.pending))
+            logger.info(f"Shard {link.index} disconnected")
+
+    async def expire(self) -> None:
+        """Watchdog: shard can be connected, but stalled, so keys, which are not answered in time, are re-queued"""
+        while True:
+            await asyncio.sleep(settings.shard_timeout / 4)
+
+            now = time.monotonic()
+            for link in list(self.links.values()):
+                keys = [key for key, deadline in link.pending.items() if deadline < now]
+                if keys:
+                    logger.warning(
+                        f"Shard {link.index} didn't answer {len(keys)} keys in {settings.shard_timeout}s, "
+                        "crawling them locally"
+                    )
+                    self.expired.update(keys)
+                    self.requeue(link, keys)
+
+    def requeue(self, link: ShardLink, keys: list[Key]) -> None:
+        """Put unanswered keys back, so local workers will crawl them"""
+        crawler = self.crawler
+        for key in keys:
+            del link.pending[key]
+            crawler.key_locks.pop(key, None)
+            crawler.deferred_keys.add(key)
+
+        # queue them before marking dispatched ones done, so queue is never seen finished in between
+        crawler.drain_deferred()
+        for _ in keys:
+            crawler.keys_queue.task_done()
+
+
+class ShardWorker(Crawler):
+    """Shard side: crawls keys sent by coordinator and reports results back."""
+
+    _reader: StreamReader
+    _writer: StreamWriter
+
+    async def init(self) -> None:
+        if not settings.shard_address or not 0 < settings.shard_index < settings.shards:
+            raise Exception(f"Bad shard config: {settings.shard_index = }, {settings.shards = }")
+
+        self.keys_queue = asyncio.Queue(maxsize=settings.queue_size)
+
+        self._reader, self._writer = await open_stream(settings.shard_address)
+        self._writer.write(encode(Hello(shard=settings.shard_index)))
+        await self._writer.drain()
+
+        self.workers = []
+        for _ in range(settings.workers):
+            ygg = Yggdrasil()
+            worker = asyncio.create_task(self.worker(ygg))
+            self.workers.append(worker)
+
+        logger.info(f"Shard {settings.shard_index}/{settings.shards}: created {len(self.workers)} workers")
+
+    async def worker(self, ygg: Yggdrasil) -> None:
+        async with ygg:
+            while True:
+                key = await self.keys_queue.get()
+
+                result = await self.crawl_key(key, ygg)
+                self._writer.write(encode(Result(result=result)))
+                await self._writer.drain()
+
+                self.keys_queue.task_done()
+
+    async def serve(self) -> None:
+        while line := await self._reader.readline():
+            msg = message_adapter.validate_json(line)
+            if isinstance(msg, Crawl):
+                # coordinator sends at most `queue_size` unanswered keys (see `ShardLink.full`), queue has room
+                await self.keys_queue.put(msg.key)
+
+        logger.info("Coordinator closed connection")
+        self._writer.close()
+
+
+async def run() -> None:
+    async with ShardWorker() as worker:
+        await worker.serve()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
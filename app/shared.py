@@ -0,0 +1,197 @@
+"""
+Snapshot shared between processes.
+
+Crawling process writes every published snapshot to `settings.snapshot_path`, web workers
+with `ROLE=server` map it read-only:
+
+    SNAPSHOT_PATH=/dev/shm/ygg-map python -m app publish &
+    ROLE=server SNAPSHOT_PATH=/dev/shm/ygg-map uvicorn app:app --workers 4
+
+File is replaced atomically (temp file + rename), so readers see either old or new generation,
+and version check on every request is one `stat()`: new file is new inode.
+`/state` documents are stored serialized and served straight from the mapping,
+nodes and connections (for other endpoints) are parsed on first use.
+
+Layout: `MAGIC`, header length (uint32 LE), `Header` json, sections (offsets in header are relative to end of header).
+"""
+
+import datetime
+import mmap
+import os
+import struct
+from functools import cached_property
+from pathlib import Path
+
+from loguru import logger
+from pydantic import BaseModel, TypeAdapter
+
+from .models import MODE, EnrichedPeerData, PeerData
+from .report import CrawlReport
+from .snapshot import Snapshot
+from .ygg import Key
+
+MAGIC = b"YGGMAP\x00\x01"
+_length = struct.Struct("<I")
+
+MODES: tuple[MODE, ...] = ("path", "peers")
+
+
+class Header(BaseModel):
+    generation: int
+    created: datetime.datetime
+
+    # name -> (offset, length)
+    sections: dict[str, tuple[int, int]]
+
+
+class Data(BaseModel):
+    peers: list[PeerData]
+    enriched_peers: list[EnrichedPeerData]
+    peers_connections: dict[Key, list[Key]]
+
+
+reports_adapter: TypeAdapter[list[CrawlReport]] = TypeAdapter(list[CrawlReport])
+
+
+def _state_section(mode: MODE) -> str:
+    return f"state/{mode}.json"
+
+
+def _packed_section(mode: MODE) -> str:
+    return f"state/{mode}.msgpack"
+
+
+def write(snapshot: Snapshot, path: Path) -> None:
+    data = Data.model_construct(
+        peers=list(snapshot.peers.values()),
+        enriched_peers=list(snapshot.enriched_peers.values()),
+        peers_connections=snapshot.peers_connections,
+    )
+
+    sections: dict[str, bytes] = {
+        "data.json": data.model_dump_json().encode(),
+        "reports.json": reports_adapter.dump_json(snapshot.reports),
+    }
+    for mode in MODES:
+        sections[_state_section(mode)] = snapshot.state_json(mode)
+        sections[_packed_section(mode)] = snapshot.packed(mode)
+
+    offset = 0
+    offsets: dict[str, tuple[int, int]] = {}
+    for name, section in sections.items():
+        offsets[name] = (offset, len(section))
+        offset += len(section)
+
+    header = Header(generation=snapshot.generation, created=snapshot.created, sections=offsets)
+    raw_header = header.model_dump_json().encode()
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(MAGIC)
+            f.write(_length.pack(len(raw_header)))
+            f.write(raw_header)
+            for section in sections.values():
+                f.write(section)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class MappedSnapshot(Snapshot):
+    """Snapshot from shared file. Serialized exports are sliced from mapping, everything else is loaded lazily"""
+
+    def __init__(self, buffer: mmap.mmap) -> None:
+        if buffer[: len(MAGIC)] != MAGIC:
+            raise ValueError("Not a snapshot file")
+
+        start = len(MAGIC) + _length.size
+        (header_length,) = _length.unpack_from(buffer, len(MAGIC))
+        header = Header.model_validate_json(buffer[start : start + header_length])
+
+        # no super().__init__(): `peers`, `enriched_peers`, `peers_connections` and `reports` are lazy here
+        self.generation = header.generation
+        self.created = header.created
+
+        self._exports = {}
+        self._records = {}
+        self._state = {}
+        self._packed = {}
+        self._lod = {}
+
+        self._buffer = buffer
+        self._base = start + header_length
+        self._sections = header.sections
+
+    def _section(self, name: str) -> bytes:
+        offset, length = self._sections[name]
+        return self._buffer[self._base + offset : self._base + offset + length]
+
+    @cached_property
+    def _data(self) -> Data:
+        return Data.model_validate_json(self._section("data.json"))
+
+    @cached_property
+    def peers(self) -> dict[Key, PeerData]:  # type: ignore[override]
+        return {peer.key: peer for peer in self._data.peers}
+
+    @cached_property
+    def enriched_peers(self) -> dict[Key, EnrichedPeerData]:  # type: ignore[override]
+        return {peer.key: peer for peer in self._data.enriched_peers}
+
+    @cached_property
+    def peers_connections(self) -> dict[Key, list[Key]]:  # type: ignore[override]
+        return self._data.peers_connections
+
+    @cached_property
+    def reports(self) -> list[CrawlReport]:  # type: ignore[override]
+        return reports_adapter.validate_json(self._section("reports.json"))
+
+    # not cached: slices are copies, mapping itself is shared between workers
+
+    def state_json(self, mode: MODE) -> bytes:
+        return self._section(_state_section(mode))
+
+    def packed(self, mode: MODE) -> bytes:
+        return self._section(_packed_section(mode))
+
+
+class SharedSnapshot:
+    """Reader side: current snapshot from `path`, re-mapped when file is replaced"""
+
+    path: Path
+
+    snapshot: Snapshot
+    # (inode, mtime, size) of mapped file
+    version: tuple[int, int, int] | None
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.snapshot = Snapshot.empty()
+        self.version = None
+
+    def current(self) -> Snapshot:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # crawler did not publish anything yet
+            return self.snapshot
+
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self.version:
+            self.load()
+
+        return self.snapshot
+
+    def load(self) -> None:
+        with self.path.open("rb") as f:
+            stat = os.fstat(f.fileno())
+            try:
+                self.snapshot = MappedSnapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except Exception as ex:
+                logger.warning(f"Bad shared snapshot {self.path}: {ex!r}")
+            else:
+                logger.info(f"Loaded shared snapshot #{self.snapshot.generation}")
+
+        # remember even bad file, so it is not re-read on every request
+        self.version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,149 @@
+import datetime
+from functools import cached_property
+
+from . import binary, stream
+from .index import GraphIndex
+from .lod import LodExport, build_lod
+from .search import SearchIndex
+from .models import MODE, EnrichedPeerData, Export, NodeId, PeerData, get_id
+from .records import Record, Records, edge_record
+from .report import CrawlReport
+from .ygg import Key
+
+
+class Snapshot:
+    """
+    Result of one finished crawl.
+
+    Crawler builds new dicts on every refresh, so published snapshot is never mutated
+    and can be served while next crawl is running.
+    """
+
+    generation: int
+    created: datetime.datetime
+
+    peers: dict[Key, PeerData]
+    enriched_peers: dict[Key, EnrichedPeerData]
+
+    peers_connections: dict[Key, list[Key]]
+
+    # crawl reports of last generations, oldest first; last one is of this snapshot
+    reports: list[CrawlReport]
+
+    def __init__(
+        self,
+        generation: int,
+        peers: dict[Key, PeerData],
+        enriched_peers: dict[Key, EnrichedPeerData],
+        peers_connections: dict[Key, list[Key]],
+        reports: list[CrawlReport] | None = None,
+    ) -> None:
+        self.generation = generation
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+
+        self.peers = peers
+        self.enriched_peers = enriched_peers
+        self.peers_connections = peers_connections
+
+        self.reports = reports or []
+
+        self._exports: dict[MODE, Export] = {}
+        self._records: dict[MODE, Records] = {}
+        self._state: dict[MODE, bytes] = {}
+        self._packed: dict[MODE, bytes] = {}
+        self._lod: dict[tuple[MODE, int], LodExport] = {}
+
+    @classmethod
+    def empty(cls) -> "Snapshot":
+        return cls(generation=0, peers={}, enriched_peers={}, peers_connections={})
+
+    def export(self, mode: MODE) -> Export:
+        if mode not in self._exports:
+            self._exports[mode] = self.records(mode).to_export()
+        return self._exports[mode]
+
+    def records(self, mode: MODE) -> Records:
+        if mode not in self._records:
+            self._records[mode] = self._build_records(mode)
+        return self._records[mode]
+
+    @cached_property
+    def index(self) -> GraphIndex:
+        return GraphIndex(self)
+
+    @cached_property
+    def search(self) -> SearchIndex:
+        return SearchIndex(self)
+
+    def lod(self, mode: MODE, depth: int, expand: list[str]) -> LodExport:
+        """Level-of-detail export, see `lod`. Only fully collapsed exports are cached"""
+        if expand:
+            return build_lod(self, mode, depth, expand)
+
+        if (mode, depth) not in self._lod:
+            self._lod[(mode, depth)] = build_lod(self, mode, depth, expand)
+        return self._lod[(mode, depth)]
+
+    def state_json(self, mode: MODE) -> bytes:
+        """Serialized `export(mode)`, as `/state` sends it"""
+        if mode not in self._state:
+            self._state[mode] = b"".join(stream.iter_json(self, mode))
+        return self._state[mode]
+
+    def packed(self, mode: MODE) -> bytes:
+        """Export in compact msgpack format, see `binary`"""
+        if mode not in self._packed:
+            self._packed[mode] = binary.pack_snapshot(self, mode)
+        return self._packed[mode]
+
+    def _build_records(self, mode: MODE) -> Records:
+        nodes: dict[tuple[int, ...], EnrichedPeerData] = dict()
+        edges: list[Record] = []
+
+        for info in self.enriched_peers.values():
+            nodes[info.tpath] = info
+
+        match mode:
+            case "path":
+                # TODO: this is copypasted from old cringe graph gen.
+                # make it normal
+                def resolve_parents(info: EnrichedPeerData):
+                    parent_coords = info.parent
+
+                    # known node: its own parents are (or will be) resolved by this loop
+                    if parent_coords in nodes:
+                        return
+
+                    parent = EnrichedPeerData.empty(parent_coords)
+                    nodes[parent.tpath] = parent
+
+                    if parent.path != parent.parent:
+                        resolve_parents(parent)
+
+                for info in self.enriched_peers.values():
+                    resolve_parents(info)
+
+                for node in nodes.values():
+                    if node.parent == node.path:
+                        continue
+
+                    e = nodes[node.parent]
+                    edges.append(edge_record(node.id, e.id))
+
+            case "peers":
+                # (from, to) -> arrows; two opposite edges are merged into one "to;from"
+                peer_edges: dict[tuple[NodeId, NodeId], str | None] = {}
+                for root_key, children in self.peers_connections.items():
+                    to = get_id(root_key)
+                    for child in children:
+                        from_ = get_id(child)
+                        if peer_edges.get((to, from_), "") is None:
+                            del peer_edges[(to, from_)]
+                            peer_edges.pop((from_, to), None)
+                            peer_edges[(from_, to)] = "to;from"
+                        else:
+                            peer_edges.setdefault((from_, to), None)
+
+                edges = [edge_record(from_, to, arrows) for (from_, to), arrows in peer_edges.items()]
+
+        return Records.build(nodes.values(), edges)
@@ -0,0 +1,137 @@
+"""
+Streaming export: nodes and edges are written straight from `Snapshot.records`, chunk by chunk,
+without building (and validating) `Export` model.
+"""
+
+import json
+import zlib
+from typing import TYPE_CHECKING, Iterable, Iterator, Literal, TypeAlias
+
+from loguru import logger
+
+from .models import MODE
+from .records import Record
+
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+    logger.debug("zstandard unavailable, zstd compression disabled")
+
+FORMAT: TypeAlias = Literal["ndjson"] | Literal["json"]
+COMPRESSION: TypeAlias = Literal["gzip"] | Literal["zstd"]
+
+MEDIA_TYPES: dict[FORMAT, str] = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+NODE_FIELDS = ("id", "label", "buildplatform", "buildversion", "cluster")
+EDGE_FIELDS = ("from", "to", "dashes", "arrows")
+
+# records per chunk
+CHUNK = 512
+
+_dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+def parse_fields(fields: str | None) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """
+    `fields=label,cluster` -> node and edge fields to send.
+    Node `id` and edge `from`/`to` are always sent, unknown names are ignored.
+    """
+    if not fields:
+        return NODE_FIELDS, EDGE_FIELDS
+
+    wanted = {field.strip() for field in fields.split(",")}
+    return (
+        tuple(field for field in NODE_FIELDS if field == "id" or field in wanted),
+        tuple(field for field in EDGE_FIELDS if field in ("from", "to") or field in wanted),
+    )
+
+
+def _project(records: list[Record], fields: tuple[str, ...], full: tuple[str, ...]) -> Iterator[Record]:
+    if fields == full:
+        yield from records
+    else:
+        for record in records:
+            yield {field: record[field] for field in fields}
+
+
+def _chunks(records: Iterable[Record], type: str | None = None, sep: str = ",", end: str = "") -> Iterator[bytes]:
+    # `type` is spliced into the object, so `{"id":1}` becomes `{"type":"node","id":1}`
+    prefix = '{"type":"%s",' % type if type else "{"
+
+    batch: list[str] = []
+    for record in records:
+        batch.append(prefix + _dumps(record)[1:])
+        if len(batch) >= CHUNK:
+            yield (sep.join(batch) + end).encode()
+            batch = []
+    if batch:
+        yield (sep.join(batch) + end).encode()
+
+
+def iter_ndjson(snapshot: "Snapshot", mode: MODE, fields: str | None = None) -> Iterator[bytes]:
+    """One object per line: `{"type":"node",...}` for every node, then `{"type":"edge",...}` for every edge"""
+    records = snapshot.records(mode)
+    node_fields, edge_fields = parse_fields(fields)
+
+    yield from _chunks(_project(records.nodes, node_fields, NODE_FIELDS), "node", "\n", "\n")
+    yield from _chunks(_project(records.edges, edge_fields, EDGE_FIELDS), "edge", "\n", "\n")
+
+
+def iter_json(snapshot: "Snapshot", mode: MODE, fields: str | None = None) -> Iterator[bytes]:
+    """Same document as `/state`, written as chunked arrays"""
+    records = snapshot.records(mode)
+    node_fields, edge_fields = parse_fields(fields)
+
+    yield b'{"nodes":['
+    for i, chunk in enumerate(_chunks(_project(records.nodes, node_fields, NODE_FIELDS))):
+        yield chunk if i == 0 else b"," + chunk
+    yield b'],"edges":['
+    for i, chunk in enumerate(_chunks(_project(records.edges, edge_fields, EDGE_FIELDS))):
+        yield chunk if i == 0 else b"," + chunk
+    yield b'],"clusters":' + _dumps(sorted(records.clusters)).encode() + b"}"
+
+
+def compress(chunks: Iterable[bytes], compression: COMPRESSION) -> Iterator[bytes]:
+    match compression:
+        case "gzip":
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            for chunk in chunks:
+                if data := compressor.compress(chunk):
+                    yield data
+            yield compressor.flush()
+
+        case "zstd":
+            if zstandard is None:
+                raise Exception("zstd compression unavailable: install zstandard")
+
+            zstd = zstandard.ZstdCompressor().compressobj()
+            for chunk in chunks:
+                if data := zstd.compress(chunk):
+                    yield data
+            yield zstd.flush()
+
+
+def stream(
+    snapshot: "Snapshot",
+    mode: MODE,
+    format: FORMAT = "ndjson",
+    fields: str | None = None,
+    compression: COMPRESSION | None = None,
+) -> Iterator[bytes]:
+    match format:
+        case "ndjson":
+            chunks = iter_ndjson(snapshot, mode, fields)
+        case "json":
+            chunks = iter_json(snapshot, mode, fields)
+
+    if compression is not None:
+        chunks = compress(chunks, compression)
+
+    return chunks
@@ -0,0 +1,374 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Literal
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
+from loguru import logger
+
+from . import binary, stream
+from .config import settings, setup_graphviz
+from .crawler import Crawler
+from .lod import LodExport
+from .models import MODE, Export, NodeInfo
+from .report import CrawlReport
+from .scheduler import RollingScheduler
+from .search import SearchResult
+from .shared import SharedSnapshot
+from .snapshot import Snapshot
+from .utils import repeat_every
+
+
+@functools.cache
+def get_crawler() -> Crawler:
+    """Crawler of this process, created on first use: importing the app doesn't construct it, role "server" never does"""
+    return Crawler()
+
+
+# role "server": snapshots are published by crawling process, see `shared`
+shared_snapshot = (
+    SharedSnapshot(settings.snapshot_path) if settings.role == "server" and settings.snapshot_path else None
+)
+
+
+def current_snapshot() -> Snapshot:
+    if shared_snapshot is not None:
+        return shared_snapshot.current()
+    return get_crawler().snapshot
+
+
+@repeat_every(
+    seconds=settings.refresh_seconds,
+    wait_first=False,
+    raise_exceptions=True,
+)  # every two minutes
+async def refresh_map():
+    crawler = get_crawler()
+    try:
+        logger.info("Refreshing map")
+        if settings.change_detection:
+            await crawler.refresh_changed()
+        else:
+            await crawler.refresh()
+        logger.info("Refreshing map ok")
+    except Exception as ex:
+        logger.warning(f"Map refresh exc: {ex!r}")
+
+
+@asynccontextmanager
+async def init(ap: FastAPI):
+    logger.info("Staring init")
+    if settings.role == "server":
+        if shared_snapshot is None:
+            raise Exception("Role server needs snapshot_path")
+
+        logger.info(f"Serving snapshots from {settings.snapshot_path}")
+        yield
+        return
+
+    async with get_crawler() as crawler:
+        if settings.crawl_mode == "rolling":
+            logger.info(f"Starting rolling crawl, freshness {settings.freshness_seconds} seconds")
+            refresh_task = asyncio.create_task(RollingScheduler(crawler).run())
+        else:
+            logger.info(f"Starting refresh task every {settings.refresh_seconds} seconds")
+            refresh_task = asyncio.create_task(refresh_map())
+        try:
+            yield
+        except Exception as ex:
+            logger.warning(f"Shutdown exception: {ex}")
+            # raise # ??
+
+
+app = FastAPI(lifespan=init)
+
+
+base_resp = """
+<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <title>Network</title>
+    <script
+      type="text/javascript"
+      src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"
+    ></script>
+    <style type="text/css">
+      #mynetwork {
+        width: 1200px;
+        height: 800px;
+        border: 2px solid lightgray;
+      }
+    </style>
+  </head>
+  <body>
+    <div id="mynetwork"></div>
+    <script type="text/javascript">
+      raw_data = {data};
+    </script>
+    <script type="text/javascript">
+      // create a network
+      var container = document.getElementById("mynetwork");
+      var data = {
+        nodes: new vis.DataSet(raw_data["nodes"]),
+        edges: new vis.DataSet(raw_data["edges"]),
+      };
+      var options = {
+        physics: {
+            solver: "repulsion",
+            repulsion: {
+                nodeDistance: 100,
+                springLength: 200,
+            },
+            barnesHut: {
+                gravitationalConstant: -500,
+                springLength: 500,
+                springConstant: 0.001
+            }
+        }
+      };
+      var network = new vis.Network(container, data, options);
+
+      // level-of-detail mode: double click on super-node expands it
+      network.on("doubleClick", function (params) {
+        var node = params.nodes.length === 1 ? data.nodes.get(params.nodes[0]) : null;
+        if (!node || !node.expand) {
+          return;
+        }
+
+        var query = new URLSearchParams({ mode: raw_data["mode"], depth: raw_data["depth"] });
+        raw_data["expanded"].concat([node.expand]).forEach(function (token) {
+          query.append("expand", token);
+        });
+
+        fetch("/state/lod?" + query)
+          .then(function (resp) { return resp.json(); })
+          .then(function (lod) {
+            raw_data = lod;
+            var ids = new Set(lod["nodes"].map(function (n) { return n.id; }));
+            data.nodes.remove(data.nodes.getIds().filter(function (id) { return !ids.has(id); }));
+            data.nodes.update(lod["nodes"]);
+            data.edges.clear();
+            data.edges.add(lod["edges"]);
+          });
+      });
+    </script>
+  </body>
+</html>
+"""
+
+
+@app.get("/")
+async def index(mode: MODE = "path", lod: bool = False, depth: int = 3) -> HTMLResponse:
+    if lod:
+        data = current_snapshot().lod(mode, depth, []).model_dump_json(by_alias=True)
+    else:
+        data = current_snapshot().state_json(mode).decode()
+    resp = base_resp.replace("{data}", data)
+
+    return HTMLResponse(content=resp)
+
+
+@app.get("/graphviz")
+async def get_graphviz(mode: MODE = "peers"):
+    # graphviz is needed only here, don't load it on startup
+    from graphviz import Digraph
+
+    setup_graphviz()
+
+    base_graph = Digraph(
+        format="png",
+    )
+    base_graph.attr(compound="true")
+    base_graph.attr("edge", dir="both")
+
+    peers = current_snapshot().export(mode)  # json.loads(await crawl("peers"))
+
+    clusters = {cluster: Digraph(f"cluster_{cluster}", comment=cluster) for cluster in peers.clusters}
+    logger.info(f"{peers.clusters = }")
+
+    for node in peers.nodes:
+        node_shape = "ellipse"
+        node_color = "black"
+        bp = node.buildplatform
+        if bp == "windows":
+            node_shape = "box"
+            node_color = "red"
+        if bp == "darwin":
+            node_shape = "diamond"
+            node_color = "green"
+        if bp == "linux":
+            node_shape = "cylinder"
+            node_color = "blue"
+
+        graph = base_graph
+        if node.cluster:
+            graph = clusters[node.cluster]
+
+        graph.attr("node", shape=node_shape, color=node_color)
+        graph.node(str(node.id), f"{node.buildversion} {node.label}")
+
+    for cluster in clusters.values():
+        cluster.attr(label=cluster.comment)
+        base_graph.subgraph(cluster)
+
+    for edge in peers.edges:
+        dir = None
+        color = None
+        if mode == "peers":
+            match edge.arrows:
+                case None:
+                    dir = "forward"
+                    color = "red"
+                case "to;forward":
+                    dir = "both"
+
+        base_graph.edge(str(edge.to), str(edge.from_), dir=dir, color=color)
+
+    return StreamingResponse(
+        BytesIO(base_graph.pipe(format="png")),
+        media_type="image/png",
+    )
+
+
+@app.get(
+    "/state",
+    response_model=Export,
+    responses={200: {"content": {binary.MEDIA_TYPE: {}}}},
+)
+async def state(mode: MODE = "path", accept: str | None = Header(None)) -> Export | Response:
+    snapshot = current_snapshot()
+    if binary.accepts(accept):
+        return Response(snapshot.packed(mode), media_type=binary.MEDIA_TYPE)
+    # already serialized, same as `Export` json
+    return Response(snapshot.state_json(mode), media_type="application/json")
+
+
+@app.get("/state/lod")
+async def state_lod(
+    mode: MODE = "path",
+    depth: int = Query(3, ge=0),
+    expand: list[str] = Query([]),
+) -> LodExport:
+    """Map with collapsed subtrees/clusters, see `lod` module. `expand` tokens are taken from super-nodes"""
+    try:
+        return current_snapshot().lod(mode, depth, expand)
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+
+@app.get("/state/stream")
+async def state_stream(
+    mode: MODE = "path",
+    format: stream.FORMAT = "ndjson",
+    fields: str | None = None,
+    compression: stream.COMPRESSION | None = None,
+) -> StreamingResponse:
+    if compression == "zstd" and stream.zstandard is None:
+        raise HTTPException(status_code=400, detail="zstd compression unavailable")
+
+    return StreamingResponse(
+        stream.stream(current_snapshot(), mode, format, fields, compression),
+        media_type=stream.MEDIA_TYPES[format],
+        headers={"Content-Encoding": compression} if compression else None,
+    )
+
+
+@app.get("/node/{key}")
+async def node(key: str) -> NodeInfo:
+    info = current_snapshot().index.node(key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return info
+
+
+@app.get("/node/{key}/neighbors")
+async def node_neighbors(key: str, depth: int = Query(1, ge=0, le=16)) -> Export:
+    records = current_snapshot().index.neighbors(key, depth)
+    if records is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return records.to_export()
+
+
+@app.get("/subtree")
+async def subtree(path: str = "", depth: int | None = Query(None, ge=0)) -> Export:
+    """`path` is coordinates, separated by comma or space: `/subtree?path=1,4,2`"""
+    try:
+        coords = [int(c) for c in path.replace(",", " ").split()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Bad path")
+
+    records = current_snapshot().index.subtree(coords, depth)
+    if records is None:
+        raise HTTPException(status_code=404, detail="Path not found")
+    return records.to_export()
+
+
+@app.get("/search")
+async def search(q: str = "", limit: int = Query(50, ge=0)) -> SearchResult:
+    """See `search` module for query syntax: `/search?q=buildplatform=windows buildversion<0.5`"""
+    try:
+        return current_snapshot().search.result(q, limit)
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+
+@app.get("/search/export")
+async def search_export(q: str = "", mode: MODE = "path") -> Export:
+    snapshot = current_snapshot()
+    try:
+        return snapshot.search.records(q, snapshot.records(mode)).to_export()
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+
+@app.get("/crawl/report")
+async def crawl_report(generation: int | None = None) -> CrawlReport:
+    """Report of latest crawl, or of `generation`, if it is still in history"""
+    reports = current_snapshot().reports
+    if generation is not None:
+        reports = [report for report in reports if report.generation == generation]
+    if not reports:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return reports[-1]
+
+
+@app.get("/crawl/reports")
+async def crawl_reports() -> list[CrawlReport]:
+    """Last `report_history` reports, oldest first"""
+    return current_snapshot().reports
+
+
+@app.get("/refresh")
+async def refresh(mode: MODE = "path") -> Export:
+    if settings.role == "server":
+        raise HTTPException(status_code=409, detail="Refresh is done by crawling process")
+
+    crawler = get_crawler()
+    await crawler.refresh()
+    return crawler.export(mode)
+
+
+@app.get("/info")
+async def info() -> PlainTextResponse:
+    if shared_snapshot is not None:
+        snapshot = shared_snapshot.current()
+        return PlainTextResponse(
+            f"Serving snapshot #{snapshot.generation} ({snapshot.created}) from {shared_snapshot.path}"
+        )
+    return PlainTextResponse(get_crawler().crawling_status())
+
+
+def start():
+    """Launched with `poetry run start` at root level"""
+    import uvicorn
+
+    workers = settings.http_workers
+    if workers > 1 and settings.role != "server":
+        # every worker would run its own crawler
+        logger.warning(f"{workers} http workers need role server, starting one")
+        workers = 1
+
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers)
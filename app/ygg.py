@@ -1,16 +1,23 @@
 import datetime
+import functools
+import sys
+import time
 from asyncio import StreamReader, StreamWriter, open_connection
 from enum import Enum
 from pathlib import Path
 from types import TracebackType
-from typing import Annotated, AsyncContextManager, Generic, Literal, NewType, TypeVar
+from typing import TYPE_CHECKING, Annotated, AsyncContextManager, Generic, Literal, NewType, TypeVar
 
 import pydantic_core
 from annotated_types import Len
 from loguru import logger
-from pydantic import BaseModel, ConfigDict, Field, RootModel, TypeAdapter
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, RootModel, TypeAdapter
 
 from .config import settings
+from .ratelimit import RemoteLimiter
+
+if TYPE_CHECKING:
+    from .report import CrawlRecorder
 
 try:
     from asyncio import open_unix_connection  # type: ignore
@@ -18,7 +25,8 @@ except ImportError:
     logger.warning(f"open_unix_connection unavailable (it's okay, if you on windows)")
 
 _Key = NewType("Key", str)  # type: ignore
-Key = Annotated[_Key, Len(min_length=64, max_length=64)]
+# same key is stored in lots of dicts and lists, interning keeps one copy of it
+Key = Annotated[_Key, Len(min_length=64, max_length=64), AfterValidator(sys.intern)]
 EmptyKey = Annotated[_Key, Len(min_length=0, max_length=0)]
 Addr = NewType("Addr", str)
 T = TypeVar("T")  # , bound=BaseResponse | RootModel
@@ -96,7 +104,7 @@ class LookupsResponse(BaseResponse):
     class Lookup(BaseResponse):
         addr: Addr
         key: Key
-        path: list[int]
+        path: tuple[int, ...]
         time: datetime.datetime
 
     infos: list[Lookup]
@@ -163,10 +171,10 @@ class BaseYggdrasil(AsyncContextManager):
 
     def __init__(
         self,
-        socket_path: Path | str = settings.ygg,
+        socket_path: Path | str | None = None,
     ) -> None:
-        self.socket_path = socket_path
-        logger.warning(f"Created BY: {socket_path = }")
+        self.socket_path = socket_path or settings.ygg
+        logger.debug(f"Created BY: {self.socket_path = }")
 
     async def __aenter__(self):
         await self.connect()
@@ -251,7 +259,36 @@ class BaseYggdrasil(AsyncContextManager):
             return await self.__do_request(req)
 
 
+@functools.cache
+def remote_limiter() -> RemoteLimiter:
+    """Shared by all clients: limits remote_* requests, which go to the overlay. Created on first remote request"""
+    return RemoteLimiter(
+        rate=settings.rpc_rate,
+        type_rates=settings.rpc_type_rates,
+        key_rate=settings.rpc_key_rate,
+        key_burst=settings.rpc_key_burst,
+    )
+
+
 class Yggdrasil(BaseYggdrasil):
+    # set by crawler for its clients, see `report`
+    recorder: "CrawlRecorder | None" = None
+
+    async def do_remote_request(self, req: BaseRequest[T]) -> SuccessResponse[T]:
+        key = req.arguments.get("key")
+        await remote_limiter().acquire(req.request, key)
+
+        started = time.perf_counter()
+        error = None
+        try:
+            return await self.do_request(req)
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            if self.recorder is not None:
+                self.recorder.record(req.request, key, time.perf_counter() - started, error)
+
     async def get_self(self) -> GetSelfResponse:
         raw = await self.do_request(BaseRequest(request="getself", response_model=GetSelfResponse))
         return raw.response
@@ -273,7 +310,7 @@ class Yggdrasil(BaseYggdrasil):
         return raw.response
 
     async def remote_get_info(self, key: Key) -> dict[str, GetNodeInfoResponse]:
-        raw = await self.do_request(
+        raw = await self.do_remote_request(
             BaseRequest(
                 request="getnodeinfo",
                 arguments={"key": key},
@@ -283,7 +320,7 @@ class Yggdrasil(BaseYggdrasil):
         return raw.response.root
 
     async def remote_get_peers(self, key: Key) -> dict[str, RemoteGetPeers]:
-        raw = await self.do_request(
+        raw = await self.do_remote_request(
             BaseRequest(
                 request="debug_remotegetpeers",
                 arguments={"key": key},
@@ -293,7 +330,7 @@ class Yggdrasil(BaseYggdrasil):
         return raw.response.root
 
     async def remote_get_self(self, key: Key) -> dict[str, RemoteGetSelf]:
-        raw = await self.do_request(
+        raw = await self.do_remote_request(
             BaseRequest(
                 request="debug_remotegetself",
                 arguments={"key": key},
@@ -303,7 +340,7 @@ class Yggdrasil(BaseYggdrasil):
         return raw.response.root
 
     async def remote_get_tree(self, key: Key) -> dict[str, RemoteGetPeers]:
-        raw = await self.do_request(
+        raw = await self.do_remote_request(
             BaseRequest(
                 request="debug_remotegettree",
                 arguments={"key": key},
@@ -0,0 +1,94 @@
+"""
+Import-time benchmark: how long does it take to start using each entrypoint.
+
+Every target is imported in fresh interpreter several times, median wall time is reported,
+together with modules, which take most of it (from `python -X importtime`).
+
+    python bench/import_time.py [--runs 7] [--top 5] [module ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = [
+    # CLI and shard workers
+    "app",
+    "app.crawler",
+    "app.shard",
+    # web server
+    "app.web",
+]
+
+
+def run(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=ROOT,
+        env=os.environ | {"PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def wall_time(module: str, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run(f"import {module}")
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def import_times(module: str) -> list[tuple[int, int, str]]:
+    """(depth, cumulative us, name) for every module imported by `import module`"""
+    stderr = run(f"import {module}", "-X", "importtime").stderr
+
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        result.append((depth, int(cumulative), name.strip()))
+
+    return result
+
+
+def slowest_imports(module: str, top: int, skip: set[str]) -> list[tuple[int, str]]:
+    """(cumulative us, name) of modules imported by target, which took most time"""
+    skip = skip | {module.rsplit(".", i)[0] for i in range(module.count(".") + 1)}
+
+    # top-level and their direct imports, deeper ones are included into them
+    result = [(cumulative, name) for depth, cumulative, name in import_times(module) if depth <= 1 and name not in skip]
+    return sorted(result, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=TARGETS)
+    args = parser.parse_args()
+
+    baseline = wall_time("sys", args.runs)
+    print(f"interpreter startup: {baseline * 1000:.1f} ms")
+    startup = {name for _, _, name in import_times("sys")}
+
+    for module in args.modules:
+        elapsed = wall_time(module, args.runs) - baseline
+        print(f"\n{module}: {elapsed * 1000:.1f} ms")
+        for cumulative, name in slowest_imports(module, args.top, startup):
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Memory benchmark: bytes per node of crawler state and of published snapshot caches.
+
+Synthetic network (random spanning tree plus extra peerings) is fed through the same models
+and crawler code as real crawl: responses are parsed from json (so every string is a fresh object,
+as with real admin socket), merged with `Crawler.merge_result` and `Crawler.merge_lookups`.
+
+    python bench/memory.py [--nodes 5000] [--extra-peers 2]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.crawler import Crawler  # noqa: E402
+from app.models import CrawlResult, PeerData  # noqa: E402
+from app.ygg import GetNodeInfoResponse, GetSelfResponse, LookupsResponse, RemoteGetPeers  # noqa: E402
+
+VERSIONS = ["0.5.5", "0.5.6", "0.5.8", "0.5.9", "0.5.10"]
+PLATFORMS = ["linux", "windows", "darwin", "openwrt", "freebsd", "android"]
+ARCHS = ["amd64", "arm64", "arm", "mipsle", "386"]
+
+
+class Network:
+    """Responses of all nodes as json strings"""
+
+    def __init__(self, nodes: int, extra_peers: int, seed: int = 0) -> None:
+        rnd = random.Random(seed)
+
+        self.keys = [rnd.randbytes(32).hex() for _ in range(nodes)]
+        self.paths: list[list[int]] = [[]]
+        peers: list[set[int]] = [set() for _ in range(nodes)]
+
+        for i in range(1, nodes):
+            parent = rnd.randrange(i)
+            self.paths.append(self.paths[parent] + [len(peers[parent]) + 1])
+            peers[i].add(parent)
+            peers[parent].add(i)
+
+        for i in range(nodes):
+            for _ in range(rnd.randrange(extra_peers + 1)):
+                j = rnd.randrange(nodes)
+                if j != i:
+                    peers[i].add(j)
+                    peers[j].add(i)
+
+        self.self_json = json.dumps(
+            {
+                "build_name": "yggdrasil",
+                "build_version": VERSIONS[-1],
+                "key": self.keys[0],
+                "address": "200::",
+                "routing_entries": nodes,
+                "subnet": "300::/64",
+            }
+        )
+
+        self.peers_json = [json.dumps({"keys": [self.keys[j] for j in sorted(peers[i])]}) for i in range(nodes)]
+        self.tree_json = [json.dumps({"keys": [self.keys[j] for j in sorted(peers[i]) if j < i]}) for i in range(nodes)]
+        self.info_json = [
+            json.dumps(
+                {
+                    "name": f"node-{i}.example",
+                    "buildname": "yggdrasil",
+                    "buildversion": rnd.choice(VERSIONS),
+                    "buildplatform": rnd.choice(PLATFORMS),
+                    "buildarch": rnd.choice(ARCHS),
+                }
+            )
+            for i in range(nodes)
+        ]
+        self.lookups_json = json.dumps(
+            {
+                "infos": [
+                    {
+                        "addr": f"200:{i:x}::1",
+                        "key": key,
+                        "path": path,
+                        "time": "2024-01-01T00:00:00Z",
+                    }
+                    for i, (key, path) in enumerate(zip(self.keys, self.paths))
+                ]
+            }
+        )
+
+
+class Lookups:
+    """Admin socket stand-in for `merge_lookups`, which only needs `lookups`"""
+
+    def __init__(self, network: Network) -> None:
+        self.network = network
+
+    async def lookups(self) -> LookupsResponse:
+        return LookupsResponse.model_validate_json(self.network.lookups_json)
+
+
+def crawl_result(network: Network, i: int, key: str) -> CrawlResult:
+    # same as `Crawler.crawl_key` and `Crawler.remote_get_info` do with responses
+    info = GetNodeInfoResponse.model_validate_json(network.info_json[i]).model_dump()
+    info["key"] = key
+    return CrawlResult(
+        key=key,
+        peer=PeerData.model_validate(info),
+        peers=RemoteGetPeers.model_validate_json(network.peers_json[i]).keys,
+        trees=RemoteGetPeers.model_validate_json(network.tree_json[i]).keys,
+    )
+
+
+def traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def run(network: Network) -> list[tuple[str, int]]:
+    crawler = Crawler()
+    crawler.self_info = GetSelfResponse.model_validate_json(network.self_json)
+    crawler.ygg = Lookups(network)  # type: ignore
+
+    stages = []
+    start = traced()
+
+    async with crawler.refresh_lock:
+        crawler.reset()
+
+        # keys, which reach workers, come from responses of other nodes
+        queued = RemoteGetPeers.model_validate_json(json.dumps({"keys": network.keys})).keys
+        for key in queued:
+            crawler.key_locks[key] = True
+        for i, key in enumerate(queued):
+            await crawler.merge_result(crawl_result(network, i, key))
+        del queued
+        stages.append(("crawl (peers, connections, locks)", traced() - start))
+
+        await crawler.merge_lookups(reload_bad=False)
+        crawler.publish()
+        stages.append(("+ lookups (enriched_peers)", traced() - start))
+
+    snapshot = crawler.snapshot
+    snapshot.records("path")
+    snapshot.records("peers")
+    stages.append(("+ records (path, peers)", traced() - start))
+
+    snapshot.index
+    snapshot.search
+    stages.append(("+ index, search", traced() - start))
+
+    return stages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--extra-peers", type=int, default=2)
+    args = parser.parse_args()
+
+    from loguru import logger
+
+    logger.remove()
+
+    network = Network(args.nodes, args.extra_peers)
+
+    tracemalloc.start()
+    stages = asyncio.run(run(network))
+
+    print(f"{args.nodes} nodes")
+    for name, size in stages:
+        print(f"{name:40} {size / 2**20:8.2f} MiB {size / args.nodes:8.0f} B/node")
+
+
+if __name__ == "__main__":
+    main()
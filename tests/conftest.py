@@ -0,0 +1,37 @@
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import pytest
+
+from app.config import settings
+
+from .fakeygg import FakeYggdrasil, Network
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+def sockets() -> Iterator[Path]:
+    # unix socket paths are limited to ~100 bytes, pytest's tmp_path can be longer
+    with tempfile.TemporaryDirectory(prefix="ygg-map-") as directory:
+        yield Path(directory)
+
+
+@pytest.fixture
+def network() -> Network:
+    return Network(nodes=60, unlisted=3)
+
+
+@pytest.fixture
+async def ygg(network: Network, sockets: Path, monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[FakeYggdrasil]:
+    """Fake admin socket, which crawler of this process uses"""
+    fake = FakeYggdrasil(network)
+    path = sockets / "ygg.sock"
+    server = await fake.start(path)
+    monkeypatch.setattr(settings, "socket", str(path))
+    async with server:
+        yield fake
@@ -0,0 +1,205 @@
+"""
+Simulated yggdrasil admin socket: random spanning tree plus extra peerings, answers requests,
+which crawler does. Used by tests, can be run standalone to try the app without real network:
+
+    python tests/fakeygg.py /tmp/ygg.sock [--nodes 200] [--delay 0.01] [--jitter 0.01]
+    SOCKET=/tmp/ygg.sock poetry run uvicorn app:app
+
+Like real daemon, it doesn't list itself in lookups, and `unlisted` nodes are reachable by crawl,
+but missing from lookups.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from pathlib import Path
+from typing import Any
+
+PLATFORMS = ["linux", "windows", "darwin", "freebsd"]
+
+
+class Network:
+    keys: list[str]
+    self_key: str
+
+    parent: dict[str, str]
+    paths: dict[str, list[int]]
+    children: dict[str, list[str]]
+    peers: dict[str, set[str]]
+    info: dict[str, dict[str, str]]
+
+    # keys in lookups response
+    listed: list[str]
+
+    def __init__(self, nodes: int = 200, seed: int = 1, unlisted: int = 0) -> None:
+        rnd = random.Random(seed)
+
+        self.keys = [f"{rnd.getrandbits(256):064x}" for _ in range(nodes)]
+        self.self_key = self.keys[0]
+
+        self.parent = {self.self_key: self.self_key}
+        self.paths = {self.self_key: []}
+        self.children = {key: [] for key in self.keys}
+        self.peers = {key: set() for key in self.keys}
+
+        for i, key in enumerate(self.keys[1:], 1):
+            parent = self.keys[rnd.randrange(i)]
+            self.parent[key] = parent
+            self.children[parent].append(key)
+            self.paths[key] = self.paths[parent] + [len(self.children[parent])]
+            self.peers[key].add(parent)
+            self.peers[parent].add(key)
+
+        for _ in range(nodes // 3):
+            a, b = rnd.sample(self.keys, 2)
+            self.peers[a].add(b)
+            self.peers[b].add(a)
+
+        self.info = {
+            key: {
+                "name": f"node{i}.cl{i % 7}",
+                "buildname": "yggdrasil",
+                "buildversion": f"0.{4 + i % 2}.{i % 5}",
+                "buildarch": "amd64",
+                "buildplatform": PLATFORMS[i % len(PLATFORMS)],
+            }
+            for i, key in enumerate(self.keys)
+        }
+
+        self.listed = self.keys[1 + unlisted :]
+
+    def respond(self, request: str, arguments: dict[str, str]) -> Any:
+        key = arguments.get("key", "")
+        match request:
+            case "getself":
+                return {
+                    "build_name": "yggdrasil",
+                    "build_version": "0.5.5",
+                    "key": self.self_key,
+                    "address": "200::1",
+                    "routing_entries": len(self.keys),
+                    "subnet": "300::/64",
+                }
+            case "getpeers":
+                return {
+                    "peers": [
+                        {
+                            "remote": "tcp://127.0.0.1:1",
+                            "up": True,
+                            "inbound": False,
+                            "port": 1,
+                            "priority": 0,
+                            "key": peer,
+                            "bytes_recvd": 1,
+                            "bytes_sent": 1,
+                            "uptime": 1.0,
+                        }
+                        for peer in sorted(self.peers[self.self_key])
+                    ]
+                }
+            case "lookups" | "getpaths":
+                return {
+                    "infos": [
+                        {
+                            "addr": f"200:{key[:4]}:{key[4:8]}::1",
+                            "key": key,
+                            "path": self.paths[key],
+                            "time": "2024-01-01T00:00:00Z",
+                        }
+                        for key in self.listed
+                    ]
+                }
+            case "gettree":
+                return {
+                    "tree": [
+                        {"address": "200::1", "key": key, "parent": self.parent[key], "sequence": 1}
+                        for key in self.keys
+                    ]
+                }
+            case "debug_remotegetpeers":
+                return {key: {"keys": sorted(self.peers[key])}}
+            case "debug_remotegettree":
+                return {key: {"keys": [self.parent[key]] + self.children[key]}}
+            case "getnodeinfo":
+                return {key: self.info[key]}
+
+        raise KeyError(request)
+
+
+class FakeYggdrasil:
+    network: Network
+    # seconds before every answer, plus random part up to `jitter`
+    delay: float
+    jitter: float
+    # request name -> count
+    requests: dict[str, int]
+
+    # key -> requests about it, which fail with "<request> timed out"
+    failing: dict[str, set[str]]
+    # key -> extra seconds before every answer about it
+    slow: dict[str, float]
+
+    def __init__(self, network: Network, delay: float = 0, jitter: float = 0) -> None:
+        self.network = network
+        self.delay = delay
+        self.jitter = jitter
+        self.requests = {}
+        self.failing = {}
+        self.slow = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # client sends one request and waits for answer, so every read is one request
+        while data := await reader.read(2**16):
+            request = json.loads(data)
+            name = request["request"]
+            arguments = request.get("arguments", {})
+            key = arguments.get("key", "")
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+            delay = self.delay + self.slow.get(key, 0)
+            if delay or self.jitter:
+                await asyncio.sleep(delay + random.uniform(0, self.jitter))
+
+            try:
+                if name in self.failing.get(key, ()):
+                    answer = {"status": "error", "request": request, "error": f"{name} timed out"}
+                else:
+                    answer = {
+                        "status": "success",
+                        "request": request,
+                        "response": self.network.respond(name, arguments),
+                    }
+            except KeyError as ex:
+                answer = {"status": "error", "request": request, "error": f"unknown {ex}"}
+
+            # same framing as daemon: indented, ends with "\n}\n"
+            writer.write(json.dumps(answer, indent=2).encode() + b"\n")
+            await writer.drain()
+
+        writer.close()
+
+    async def start(self, path: Path) -> asyncio.Server:
+        path.unlink(missing_ok=True)
+        return await asyncio.start_unix_server(self.handle, path, limit=2**30)
+
+
+async def serve(path: Path, nodes: int, delay: float, jitter: float) -> None:
+    server = await FakeYggdrasil(Network(nodes), delay, jitter).start(path)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("socket", type=Path)
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.socket, args.nodes, args.delay, args.jitter))
+
+
+if __name__ == "__main__":
+    main()
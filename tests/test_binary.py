@@ -0,0 +1,46 @@
+from array import array
+from typing import get_args
+
+import msgpack
+import pytest
+
+from app.crawler import Crawler
+from app.models import MODE, get_id
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+
+def uint32(raw: bytes) -> list[int]:
+    return array("I", raw).tolist()
+
+
+@pytest.mark.parametrize("mode", [get_args(mode)[0] for mode in get_args(MODE)])
+async def test_round_trip(ygg: FakeYggdrasil, network: Network, mode: MODE) -> None:
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+    snapshot = crawler.snapshot
+    records = snapshot.records(mode)
+    doc = msgpack.unpackb(snapshot.packed(mode))
+
+    nodes = doc["nodes"]
+    count = nodes["count"]
+    keys = [nodes["key"][i * 32 : (i + 1) * 32].hex() for i in range(count)]
+    assert keys[: len(records.nodes)] == [key or "00" * 32 for key in records.keys]
+    assert nodes["label"][: len(records.nodes)] == [node["label"] for node in records.nodes]
+
+    ids = [node["id"] for node in records.nodes] + [get_id(key) for key in keys[len(records.nodes) :]]
+    indptr = uint32(doc["edges"]["indptr"])
+    indices = uint32(doc["edges"]["indices"])
+    assert len(indptr) == count + 1 and indptr[-1] == len(indices) == doc["edges"]["count"]
+
+    edges = sorted((ids[i], ids[j]) for i in range(count) for j in indices[indptr[i] : indptr[i + 1]])
+    assert edges == sorted((edge["from"], edge["to"]) for edge in records.edges)
+
+    if mode == "peers":
+        # own node and crawled nodes, which are not in lookups, get rows after lookup nodes
+        extra = {keys[i]: nodes["label"][i] for i in range(len(records.nodes), count)}
+        assert set(extra) == set(network.keys) - set(network.listed)
+        assert extra[network.self_key] == network.info[network.self_key]["name"]
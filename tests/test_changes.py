@@ -0,0 +1,27 @@
+import pytest
+
+from app.crawler import Crawler
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_narrowed_refresh_keeps_own_node(ygg: FakeYggdrasil, network: Network) -> None:
+    own = network.self_key
+
+    async with Crawler() as crawler:
+        await crawler.refresh_changed()
+        assert crawler.snapshot.reports[-1].kind == "full"
+
+        # root-adjacent change: own node is one of changed tree parents
+        child = network.children[own][0]
+        network.parent[child] = next(key for key in network.keys if key not in (own, child))
+
+        await crawler.refresh_changed()
+
+    snapshot = crawler.snapshot
+    assert snapshot.reports[-1].kind == "partial"
+    assert own in snapshot.peers
+    assert snapshot.index.node(own) is not None
+    assert set(snapshot.peers) == set(network.keys)
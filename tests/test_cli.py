@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from app.__main__ import write
+from app.config import settings
+from app.crawler import Crawler
+
+from .fakeygg import FakeYggdrasil
+
+pytestmark = pytest.mark.anyio
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def run_cli(*args: str) -> tuple[bytes, bytes]:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "app",
+        *args,
+        cwd=ROOT,
+        env=os.environ | {"SOCKET": str(settings.socket)},
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    assert process.returncode == 0, stderr.decode()
+    return stdout, stderr
+
+
+async def test_crawl_to_stdout(ygg: FakeYggdrasil) -> None:
+    stdout, stderr = await run_cli("crawl", "-f", "json", "-o", "-", "-q")
+
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+    assert stdout == crawler.snapshot.state_json("path")
+    assert stderr == b""
+
+
+async def test_crawl_to_file(ygg: FakeYggdrasil, tmp_path: Path) -> None:
+    await run_cli("crawl", "-n", "2", "-m", "peers", "-f", "msgpack", "-o", str(tmp_path / "map-{generation}.bin"))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["map-1.bin", "map-2.bin"]
+
+
+def test_write_failure(tmp_path: Path) -> None:
+    path = tmp_path / "map.json"
+    path.write_bytes(b"old")
+
+    def chunks() -> Iterator[bytes]:
+        yield b"new"
+        raise KeyError(0)
+
+    with pytest.raises(KeyError):
+        write(chunks(), str(path), 1)
+
+    # previous file is kept, temporary one is removed
+    assert list(tmp_path.iterdir()) == [path]
+    assert path.read_bytes() == b"old"
+
+    assert write([b"new"], str(path), 1) == 3
+    assert list(tmp_path.iterdir()) == [path]
+    assert path.read_bytes() == b"new"
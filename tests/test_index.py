@@ -0,0 +1,23 @@
+from app.models import EnrichedPeerData
+from app.snapshot import Snapshot
+from app.ygg import Addr
+
+
+def test_coords_missing_from_lookups() -> None:
+    # (1, 2) and (2,) are not in lookups, (1, 2, 3) comes before its ancestors
+    paths = [(1, 2, 3), (1,), (2, 1)]
+    keys = [f"{i + 1:064x}" for i in range(len(paths))]
+    enriched = {
+        key: EnrichedPeerData(addr=Addr(f"200::{i}"), key=key, path=path, name=f"node{i}")
+        for i, (key, path) in enumerate(zip(keys, paths))
+    }
+    index = Snapshot(generation=1, peers={}, enriched_peers=enriched, peers_connections={}).index
+
+    assert index.children[()] == [(1,), (2,)]
+    assert index.children[(1,)] == [(1, 2)]
+    assert index.children[(1, 2)] == [(1, 2, 3)]
+    assert index.sizes[()] == 6
+
+    subtree = index.subtree((1,))
+    assert subtree is not None
+    assert subtree.keys == [keys[1], "", keys[0]]
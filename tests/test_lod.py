@@ -0,0 +1,39 @@
+from app.lod import group_id
+from app.models import EnrichedPeerData, get_id
+from app.snapshot import Snapshot
+from app.ygg import Addr
+
+KEYS = {name: f"{i + 1:064x}" for i, name in enumerate(["a1", "a2", "b1", "b2"])}
+
+
+def snapshot(connections: dict[str, list[str]]) -> Snapshot:
+    enriched = {
+        key: EnrichedPeerData(addr=Addr(f"200::{i}"), key=key, path=(i + 1,), name=f"{name[0]}.{name}")
+        for i, (name, key) in enumerate(KEYS.items())
+    }
+    return Snapshot(
+        generation=1,
+        peers=dict(enriched),
+        enriched_peers=enriched,
+        peers_connections={KEYS[name]: [KEYS[peer] for peer in peers] for name, peers in connections.items()},
+    )
+
+
+def test_merged_edge_direction() -> None:
+    a, b = group_id("cluster", "a"), group_id("cluster", "b")
+
+    # both edges point from cluster b to cluster a
+    (edge,) = snapshot({"a1": ["b1"], "a2": ["b2"]}).lod("peers", 0, []).edges
+    assert (edge.from_, edge.to, edge.arrows, edge.value) == (b, a, None, 2)
+
+    # one of them points back
+    (edge,) = snapshot({"a1": ["b1"], "b2": ["a2"]}).lod("peers", 0, []).edges
+    assert (edge.arrows, edge.value) == ("to;from", 2)
+
+
+def test_expanded_cluster_edges() -> None:
+    lod = snapshot({"a1": ["b1"], "a2": ["b2"]}).lod("peers", 0, ["cluster:a"])
+
+    b = group_id("cluster", "b")
+    edges = sorted((edge.from_, edge.to, edge.arrows) for edge in lod.edges)
+    assert edges == sorted([(b, get_id(KEYS["a1"]), None), (b, get_id(KEYS["a2"]), None)])
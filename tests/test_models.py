@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pydantic
+import pytest
+
+from app import models
+from app.models import EnrichedPeerData, PeerData
+from app.ygg import Addr, LookupsResponse
+
+KEY = "a" * 64
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_peer_data_is_plain_model() -> None:
+    first, second = PeerData(key=KEY, name="one"), PeerData(key=KEY, name="two")
+    first.name = "three"
+    first.buildplatform = "linux"
+
+    assert first.model_fields_set == {"key", "name", "buildplatform"}
+    assert second.model_fields_set == {"key", "name"}
+    assert second.model_dump(exclude_unset=True) == {"key": KEY, "name": "two"}
+    assert first.model_copy(update={"name": "four"}).name == "four"
+    assert first.name == "three"
+
+
+def test_enriched_copy_drops_cache() -> None:
+    lookup = LookupsResponse.Lookup(addr=Addr("200::1"), key=KEY, path=(1, 2), time="2024-01-01T00:00:00Z")
+    node = EnrichedPeerData.from_lookup(lookup, PeerData(key=KEY, name="one"))
+    assert node.label == "one - 200::1"
+
+    with pytest.raises(pydantic.ValidationError):
+        node.name = "two"
+
+    copy = node.model_copy(update={"name": "two", "path": (3,)})
+    assert (copy.label, copy.parent) == ("two - 200::1", ())
+    assert (node.label, node.parent) == ("one - 200::1", (1,))
+
+
+@pytest.mark.parametrize("direct", [True, False], ids=["direct", "model_construct"])
+def test_from_lookup(monkeypatch: pytest.MonkeyPatch, direct: bool) -> None:
+    monkeypatch.setattr(models, "_direct_construct", direct)
+
+    lookup = LookupsResponse.Lookup(addr=Addr("200::1"), key=KEY, path=(1, 2), time="2024-01-01T00:00:00Z")
+    peer = PeerData(key=KEY, name="node.example", buildplatform="linux")
+
+    node = EnrichedPeerData.from_lookup(lookup, peer)
+    assert node == EnrichedPeerData.model_validate(peer.model_dump() | lookup.model_dump(exclude={"time"}))
+    assert node.model_fields_set == set(EnrichedPeerData.model_fields)
+    assert node.label == "node.example - 200::1"
+    assert node.parent == (1,)
+    assert node.model_copy(update={"name": "other"}).label == "other - 200::1"
+
+
+def test_placeholder_id_is_stable_between_processes() -> None:
+    code = "from app.models import EnrichedPeerData; print(EnrichedPeerData.empty((1, 2)).id)"
+    ids = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env=os.environ | {"PYTHONHASHSEED": seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        for seed in ("1", "2")
+    }
+    assert ids == {f"{EnrichedPeerData.empty((1, 2)).id}\n"}
+    assert EnrichedPeerData.empty((1, 2)).id != EnrichedPeerData.empty((2, 1)).id
@@ -0,0 +1,29 @@
+import pytest
+
+from app.config import settings
+from app.crawler import Crawler
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("network", [Network(nodes=100, seed=seed) for seed in range(10)])
+@pytest.mark.parametrize("queue_size", [1, 3])
+async def test_bounded_queue(
+    ygg: FakeYggdrasil, network: Network, monkeypatch: pytest.MonkeyPatch, queue_size: int
+) -> None:
+    monkeypatch.setattr(settings, "queue_size", queue_size)
+    monkeypatch.setattr(settings, "workers", 2)
+    # reloading would hide keys, which were not crawled in time
+    monkeypatch.setattr(settings, "reload_bad", False)
+    # workers finish in random order
+    ygg.jitter = 0.003
+
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+        # refresh returned only after everything was crawled
+        assert crawler.keys_queue.empty()
+        assert not crawler.deferred_keys
+        assert set(crawler.snapshot.peers) == set(network.keys)
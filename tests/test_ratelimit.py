@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import ratelimit
+from app.ratelimit import RemoteLimiter, TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Virtual time for `ratelimit`: sleeping moves it forward at once"""
+
+    now: float
+    sleeps: list[float]
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    monkeypatch.setattr(ratelimit, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+
+async def test_rate_and_burst(clock: Clock) -> None:
+    bucket = TokenBucket(rate=2, burst=3)
+
+    for _ in range(3):
+        await bucket.acquire()
+    assert clock.sleeps == []
+
+    await bucket.acquire()
+    assert clock.sleeps == [0.5]
+
+    # idle time refills up to burst only
+    clock.now += 60
+    for _ in range(3):
+        await bucket.acquire()
+    assert clock.sleeps == [0.5]
+    await bucket.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_default_burst(clock: Clock) -> None:
+    assert TokenBucket(0.5).capacity == 1
+    assert TokenBucket(5).capacity == 5
+
+
+async def test_fifo(clock: Clock) -> None:
+    bucket = TokenBucket(rate=1, burst=1)
+    done: list[int] = []
+
+    async def request(i: int) -> None:
+        await bucket.acquire()
+        done.append(i)
+
+    await asyncio.gather(*(request(i) for i in range(5)))
+
+    assert done == [0, 1, 2, 3, 4]
+    assert clock.now == 1004.0
+
+
+async def test_limiter(clock: Clock) -> None:
+    limiter = RemoteLimiter(rate=0, type_rates={"getnodeinfo": 10, "getpeers": 0}, key_rate=1, key_burst=2)
+    assert limiter.total is None and set(limiter.types) == {"getnodeinfo"}
+
+    # every key has own bucket
+    for key in ("a", "a", "b", "b"):
+        await limiter.acquire("remotegetpeers", key)
+    assert clock.sleeps == []
+
+    await limiter.acquire("remotegetpeers", "a")
+    assert clock.sleeps == [1.0]
+
+    # types without rate and requests without key are not limited by key buckets
+    for _ in range(20):
+        await limiter.acquire("getpeers")
+    assert clock.sleeps == [1.0]
+
+    for _ in range(11):
+        await limiter.acquire("getnodeinfo")
+    assert clock.sleeps == [1.0, pytest.approx(0.1)]
+
+
+async def test_total(clock: Clock) -> None:
+    limiter = RemoteLimiter(rate=4)
+
+    for request in ("getnodeinfo", "remotegetpeers", "remotegettree", "getnodeinfo", "getnodeinfo"):
+        await limiter.acquire(request, "a")
+    assert clock.sleeps == [0.25]
+
+
+async def test_prune(clock: Clock) -> None:
+    limiter = RemoteLimiter(key_rate=1, key_burst=2)
+    limiter.max_idle_keys = 2
+
+    await limiter.acquire("getnodeinfo", "a")
+    await limiter.acquire("getnodeinfo", "b")
+
+    # buckets of "a" and "b" are still in use (not refilled)
+    await limiter.acquire("getnodeinfo", "c")
+    assert set(limiter.keys) == {"a", "b", "c"}
+
+    # idle ones are dropped
+    clock.now += 1
+    await limiter.acquire("getnodeinfo", "d")
+    assert set(limiter.keys) == {"d"}
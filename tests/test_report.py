@@ -0,0 +1,103 @@
+import pytest
+
+from app.config import settings
+from app.crawler import Crawler
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+PEERS = "debug_remotegetpeers"
+TREE = "debug_remotegettree"
+INFO = "getnodeinfo"
+
+
+def reachable(network: Network, silent: str) -> set[str]:
+    """Keys, which crawler finds from own peers, if `silent` key doesn't tell its peers"""
+    found = set(network.peers[network.self_key])
+    todo = list(found)
+    while todo:
+        key = todo.pop()
+        if key == silent:
+            continue
+        for other in network.peers[key] | {network.parent[key], *network.children[key]}:
+            if other not in found and other != network.self_key:
+                found.add(other)
+                todo.append(other)
+    return found
+
+
+def setup_failures(ygg: FakeYggdrasil) -> tuple[str, set[str], str, list[str]]:
+    """
+    Makes some keys fail or answer slowly. Returns:
+    key, which fails peers and info requests, so nodes behind it are not found by crawl;
+    these hidden nodes (they fail peers requests, like unreachable nodes from lookups);
+    key, which fails only info request; slow keys, slowest first
+    """
+    network = ygg.network
+    own = network.peers[network.self_key]
+
+    hidden_by = {key: set(network.listed) - reachable(network, key) for key in network.keys[1:] if key not in own}
+    silent = min((key for key in hidden_by if hidden_by[key]), key=lambda key: (len(hidden_by[key]), key))
+    hidden = hidden_by[silent]
+    no_info = next(key for key in sorted(network.listed) if key not in hidden and key != silent)
+    slow = sorted(own)[:3]
+    assert len(slow) == 3 and no_info not in slow
+
+    ygg.failing = {silent: {PEERS, INFO}, no_info: {INFO}} | {key: {PEERS} for key in hidden}
+    for key, delay in zip(slow, (0.3, 0.2, 0.1)):
+        ygg.slow[key] = delay
+    return silent, hidden, no_info, slow
+
+
+@pytest.mark.parametrize("reload_bad", [False, True], ids=["no_reload", "reload"])
+async def test_failures(ygg: FakeYggdrasil, monkeypatch: pytest.MonkeyPatch, reload_bad: bool) -> None:
+    monkeypatch.setattr(settings, "reload_bad", reload_bad)
+    monkeypatch.setattr(settings, "report_top", 5)
+    silent, hidden, no_info, slow = setup_failures(ygg)
+
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+    snapshot = crawler.snapshot
+    (report,) = snapshot.reports
+    assert report.kind == "full"
+
+    # most failing first
+    assert report.failing[0].key == silent
+    assert report.failing[0].errors == {PEERS: f"{PEERS} timed out", INFO: f"{INFO} timed out"}
+    failing = {failing.key: failing.errors for failing in report.failing}
+    assert failing[no_info] == {INFO: f"{INFO} timed out"}
+
+    assert sorted(report.not_crawled) == sorted(hidden)
+    assert report.reloaded == reload_bad
+    if reload_bad:
+        # crawled after all: node info is there, peers are not
+        assert hidden <= set(snapshot.peers)
+        assert all(snapshot.peers[key].name == ygg.network.info[key]["name"] for key in hidden)
+        assert report.failing_count == 2 + len(hidden)
+        assert report.requests[PEERS].errors == 1 + len(hidden)
+    else:
+        assert not hidden & set(snapshot.peers)
+        assert report.failing_count == 2
+        assert report.requests[PEERS].errors == 1
+    assert report.requests[INFO].errors == 2
+    assert report.requests[TREE].errors == 0
+
+    assert len(report.slowest) == settings.report_top
+    assert [key.key for key in report.slowest[:3]] == slow
+    for key, delay in zip(report.slowest, (0.3, 0.2, 0.1)):
+        assert key.requests == 3
+        assert key.seconds >= 3 * delay
+
+
+async def test_history(ygg: FakeYggdrasil, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "report_history", 3)
+
+    async with Crawler() as crawler:
+        for _ in range(5):
+            await crawler.refresh()
+
+    reports = crawler.snapshot.reports
+    assert [report.generation for report in reports] == [3, 4, 5]
+    assert all(report.requests[INFO].count == len(crawler.snapshot.peers) for report in reports)
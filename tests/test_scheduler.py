@@ -0,0 +1,75 @@
+import asyncio
+from collections import Counter
+
+import anyio
+import pytest
+
+from app.config import settings
+from app.crawler import Crawler
+from app.scheduler import RollingScheduler
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+
+def remove_leaf(network: Network) -> str:
+    """Node disappears: nobody has it in peers or tree, and it's not in lookups"""
+    own = network.peers[network.self_key]
+    key = next(key for key in reversed(network.listed) if not network.children[key] and key not in own)
+
+    network.listed.remove(key)
+    network.children[network.parent[key]].remove(key)
+    for peer in network.peers[key]:
+        network.peers[peer].discard(key)
+    network.peers[key] = set()
+    return key
+
+
+async def test_rolling(ygg: FakeYggdrasil, network: Network, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "freshness_seconds", 1)
+    monkeypatch.setattr(settings, "publish_seconds", 0.2)
+
+    probes: Counter[str] = Counter()
+    probe = RollingScheduler.probe
+
+    async def counting(self: RollingScheduler, key: str) -> None:
+        probes[key] += 1
+        await probe(self, key)
+
+    monkeypatch.setattr(RollingScheduler, "probe", counting)
+
+    async with Crawler() as crawler:
+        scheduler = RollingScheduler(crawler)
+        task = asyncio.create_task(scheduler.run())
+        try:
+            # every node is re-probed: root peers right away and after `freshness_seconds`,
+            # nodes found by workers at random phase within it
+            crawled = set(network.keys) - {network.self_key}
+            with anyio.fail_after(20):
+                while not (set(probes) == crawled and min(probes.values()) >= 2):
+                    await asyncio.sleep(0.1)
+
+            snapshot = crawler.snapshot
+            assert snapshot.generation > 1
+            assert {report.kind for report in snapshot.reports} == {"rolling"}
+            assert set(snapshot.peers) == set(network.keys)
+            assert set(snapshot.enriched_peers) == set(network.listed)
+
+            gone = remove_leaf(network)
+            with anyio.fail_after(20):
+                while gone in crawler.snapshot.peers:
+                    await asyncio.sleep(0.1)
+
+            generation = crawler.snapshot.generation
+            with anyio.fail_after(20):
+                while crawler.snapshot.generation < generation + 2:
+                    await asyncio.sleep(0.1)
+        finally:
+            task.cancel()
+
+    snapshot = crawler.snapshot
+    assert gone not in snapshot.peers and gone not in snapshot.peers_connections
+    assert gone not in scheduler.probed and gone not in scheduler.scheduled
+    assert set(snapshot.peers) == set(network.keys) - {gone}
+    assert [report.generation for report in snapshot.reports] == list(range(1, snapshot.generation + 1))
@@ -0,0 +1,98 @@
+import pytest
+
+from app.models import EnrichedPeerData
+from app.records import node_cluster
+from app.snapshot import Snapshot
+from app.ygg import Addr
+
+# name, buildplatform, buildversion, explicit cluster
+NODES = [
+    ("alpha.lab", "linux", "0.4.7", None),
+    ("Gamma.Alpha", "windows", "0.4.10", None),
+    ("alphabet.lab", "windows", "0.5.1", None),
+    ("beta.home", "windows", "0.4.9", "office"),
+    ("delta.home", "linux", "unknown", None),
+]
+KEYS = [f"{i:02x}" * 32 for i in range(0xA1, 0xA1 + len(NODES))]
+
+
+@pytest.fixture
+def snapshot() -> Snapshot:
+    enriched = {
+        key: EnrichedPeerData(
+            addr=Addr(f"200::{i}"),
+            key=key,
+            path=(i + 1,),
+            name=name,
+            buildplatform=platform,
+            buildversion=version,
+            cluster=cluster,
+        )
+        for i, (key, (name, platform, version, cluster)) in enumerate(zip(KEYS, NODES))
+    }
+    return Snapshot(generation=1, peers=dict(enriched), enriched_peers=enriched, peers_connections={})
+
+
+def names(snapshot: Snapshot, query: str) -> list[str]:
+    return [node.name for node in snapshot.search.search(query)]
+
+
+def test_fields(snapshot: Snapshot) -> None:
+    assert names(snapshot, "buildplatform=windows buildversion<0.5") == ["Gamma.Alpha", "beta.home"]
+    assert names(snapshot, "BuildPlatform=Linux") == ["alpha.lab", "delta.home"]
+    assert names(snapshot, "buildplatform!=windows") == ["alpha.lab", "delta.home"]
+    assert names(snapshot, "name~ph") == ["alpha.lab", "Gamma.Alpha", "alphabet.lab"]
+    assert names(snapshot, "name=alpha*") == ["alpha.lab", "alphabet.lab"]
+    assert names(snapshot, "name=beta.home") == ["beta.home"]
+    assert names(snapshot, "buildversion=0.4*") == ["alpha.lab", "Gamma.Alpha", "beta.home"]
+
+
+def test_prefix(snapshot: Snapshot) -> None:
+    assert names(snapshot, f"key={KEYS[2][:6]}*") == ["alphabet.lab"]
+    assert names(snapshot, "key=a*") == [name for name, *_ in NODES]
+    assert names(snapshot, "addr=200::3*") == ["beta.home"]
+    assert names(snapshot, "key=ff*") == []
+
+
+def test_versions(snapshot: Snapshot) -> None:
+    # compared as versions, not strings; nodes without version never match
+    assert names(snapshot, "buildversion>0.4.9") == ["Gamma.Alpha", "alphabet.lab"]
+    assert names(snapshot, "buildversion>=0.4.9") == ["Gamma.Alpha", "alphabet.lab", "beta.home"]
+    assert names(snapshot, "buildversion<=0.4.7") == ["alpha.lab"]
+
+
+def test_cluster(snapshot: Snapshot) -> None:
+    assert names(snapshot, "cluster=alpha") == ["alpha.lab"]
+    assert names(snapshot, "cluster=office") == ["beta.home"]
+    assert names(snapshot, "cluster=beta") == []
+
+    # same clusters as in exports
+    records = snapshot.records("peers")
+    assert {node.name: node_cluster(node).lower() for node in snapshot.enriched_peers.values()} == {
+        node["label"].split(" - ")[0]: node["cluster"].lower() for node in records.nodes
+    }
+
+
+def test_bare_terms(snapshot: Snapshot) -> None:
+    # name prefix goes before substring match
+    assert names(snapshot, "alpha") == ["alpha.lab", "alphabet.lab", "Gamma.Alpha"]
+    # key prefix
+    assert names(snapshot, KEYS[3][:4]) == ["beta.home"]
+    # all terms must match, in any order
+    assert names(snapshot, "lab buildplatform=windows") == ["alphabet.lab"]
+    assert names(snapshot, "buildplatform=windows lab") == ["alphabet.lab"]
+    assert names(snapshot, "alpha home") == []
+    assert names(snapshot, "") == [name for name, *_ in NODES]
+
+
+def test_result(snapshot: Snapshot) -> None:
+    result = snapshot.search.result("alpha", limit=1)
+    assert result.count == 3
+    assert [node.name for node in result.nodes] == ["alpha.lab"]
+    assert len(result.ids) == 3
+
+
+@pytest.mark.parametrize("query", ["foo=1", "buildversion<abc", "name=alpha buildversion>=x"])
+def test_bad_query(snapshot: Snapshot, query: str) -> None:
+    with pytest.raises(ValueError):
+        snapshot.search.search(query)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import anyio
+import pytest
+
+from app import shard
+from app.config import settings
+from app.crawler import Crawler
+from app.snapshot import Snapshot
+
+from .fakeygg import FakeYggdrasil, Network
+
+pytestmark = pytest.mark.anyio
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def check_snapshot(snapshot: Snapshot, network: Network) -> None:
+    assert set(snapshot.peers) == set(network.keys)
+    assert set(snapshot.enriched_peers) == set(network.listed)
+
+    # own node is filled from getnodeinfo, but is not crawled with remotegetpeers
+    crawled = set(network.keys) - {network.self_key}
+    assert set(snapshot.peers_connections) == crawled
+    for key in crawled:
+        assert sorted(snapshot.peers_connections[key]) == sorted(network.peers[key])
+        assert snapshot.peers[key].name == network.info[key]["name"]
+
+
+def use_shards(monkeypatch: pytest.MonkeyPatch, sockets: Path, shards: int) -> str:
+    address = str(sockets / "shards.sock")
+    monkeypatch.setattr(settings, "shards", shards)
+    monkeypatch.setattr(settings, "shard_index", 0)
+    monkeypatch.setattr(settings, "shard_address", address)
+    return address
+
+
+async def wait_links(crawler: Crawler, count: int) -> None:
+    assert crawler.shards is not None
+    with anyio.fail_after(20):
+        while len(crawler.shards.links) < count:
+            await asyncio.sleep(0.05)
+
+
+async def test_crawl(ygg: FakeYggdrasil, network: Network) -> None:
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+    check_snapshot(crawler.snapshot, network)
+
+
+async def test_sharded_crawl(
+    ygg: FakeYggdrasil, network: Network, sockets: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    address = use_shards(monkeypatch, sockets, 3)
+
+    async with Crawler() as crawler:
+        workers = [
+            await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "app.shard",
+                cwd=ROOT,
+                env=os.environ
+                | {
+                    "SOCKET": str(settings.socket),
+                    "SHARDS": "3",
+                    "SHARD_INDEX": str(index),
+                    "SHARD_ADDRESS": address,
+                },
+            )
+            for index in (1, 2)
+        ]
+        try:
+            await wait_links(crawler, 2)
+            with anyio.fail_after(30):
+                await crawler.refresh()
+        finally:
+            for worker in workers:
+                worker.terminate()
+                await worker.wait()
+
+    check_snapshot(crawler.snapshot, network)
+
+    # most keys were crawled by shard processes, with their own sockets
+    own = sum(1 for key in network.keys if shard.shard_of(key) == 0)
+    assert crawler.snapshot.reports[-1].requests["getnodeinfo"].count < own + 5 < len(network.keys)
+
+
+async def fake_shard(address: str, stall: bool) -> None:
+    """Shard, which takes keys and never answers (stalled), or disconnects after first key"""
+    reader, writer = await shard.open_stream(address)
+    writer.write(shard.encode(shard.Hello(shard=1)))
+    await writer.drain()
+
+    while await reader.readline():
+        if not stall:
+            break
+
+    writer.close()
+
+
+@pytest.mark.parametrize("stall", [True, False], ids=["stalled", "disconnected"])
+async def test_bad_shard(
+    ygg: FakeYggdrasil,
+    network: Network,
+    sockets: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    stall: bool,
+) -> None:
+    address = use_shards(monkeypatch, sockets, 2)
+    monkeypatch.setattr(settings, "shard_timeout", 0.4)
+
+    async with Crawler() as crawler:
+        stub = asyncio.create_task(fake_shard(address, stall))
+        await wait_links(crawler, 1)
+
+        with anyio.fail_after(20):
+            await crawler.refresh()
+        stub.cancel()
+
+    check_snapshot(crawler.snapshot, network)
+
+
+async def test_busy_shard(ygg: FakeYggdrasil, network: Network, sockets: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    address = use_shards(monkeypatch, sockets, 2)
+    monkeypatch.setattr(settings, "shard_timeout", 0.4)
+    monkeypatch.setattr(settings, "queue_size", 4)
+
+    # most unanswered keys shard ever had
+    peak = 0
+    dispatch = shard.ShardLink.dispatch
+
+    def counting(link: shard.ShardLink, key: str) -> None:
+        nonlocal peak
+        dispatch(link, key)
+        peak = max(peak, len(link.pending))
+
+    monkeypatch.setattr(shard.ShardLink, "dispatch", counting)
+
+    async with Crawler() as crawler:
+        stub = asyncio.create_task(fake_shard(address, stall=True))
+        await wait_links(crawler, 1)
+
+        with anyio.fail_after(20):
+            await crawler.refresh()
+        stub.cancel()
+
+    check_snapshot(crawler.snapshot, network)
+    # the rest of its keys were crawled locally, instead of waiting in socket buffers
+    assert peak == 4 < sum(1 for key in network.keys if shard.shard_of(key) == 1)
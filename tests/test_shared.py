@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app import binary, shared
+from app.config import settings
+from app.crawler import Crawler
+
+from .fakeygg import FakeYggdrasil
+
+pytestmark = pytest.mark.anyio
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# web worker with role "server": gets (url, accept) pairs from argv (json), prints bodies (hex)
+SERVER = """
+import json, sys
+from fastapi.testclient import TestClient
+from app import app
+
+with TestClient(app) as client:
+    bodies = []
+    for url, accept in json.loads(sys.argv[1]):
+        resp = client.get(url, headers={"Accept": accept} if accept else {})
+        resp.raise_for_status()
+        bodies.append(resp.content.hex())
+print(json.dumps(bodies))
+"""
+
+# (url, Accept header)
+REQUESTS = [
+    ("/state?mode=path", None),
+    ("/state?mode=peers", "application/msgpack"),
+    ("/subtree?path=", None),
+    ("/state/lod?mode=path&depth=1", None),
+    ("/crawl/report", None),
+]
+
+
+def serve(path: Path) -> dict[tuple[str, str | None], bytes]:
+    result = subprocess.run(
+        [sys.executable, "-c", SERVER, json.dumps(REQUESTS)],
+        cwd=ROOT,
+        env=os.environ | {"ROLE": "server", "SNAPSHOT_PATH": str(path)},
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return {request: bytes.fromhex(body) for request, body in zip(REQUESTS, json.loads(result.stdout), strict=True)}
+
+
+async def test_write_and_map(ygg: FakeYggdrasil, sockets: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = sockets / "snapshot"
+    monkeypatch.setattr(settings, "snapshot_path", path)
+
+    async with Crawler() as crawler:
+        await crawler.refresh()
+
+        snapshot = crawler.snapshot
+        reader = shared.SharedSnapshot(path)
+        mapped = reader.current()
+        assert mapped.generation == snapshot.generation
+        for mode in shared.MODES:
+            assert mapped.state_json(mode) == snapshot.state_json(mode)
+            assert mapped.packed(mode) == snapshot.packed(mode)
+            assert mapped.records(mode).nodes == snapshot.records(mode).nodes
+        assert mapped.reports == snapshot.reports
+
+        # new file is picked up
+        await crawler.refresh()
+        assert reader.current().generation == snapshot.generation + 1
+
+
+async def test_server_workers(ygg: FakeYggdrasil, sockets: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = sockets / "snapshot"
+    monkeypatch.setattr(settings, "snapshot_path", path)
+
+    async with Crawler() as crawler:
+        await crawler.refresh()
+    snapshot = crawler.snapshot
+
+    first, second = serve(path), serve(path)
+    # endpoints, which are computed by workers themselves (including placeholder ids), agree between them
+    assert first == second
+
+    assert first["/state?mode=path", None] == snapshot.state_json("path")
+    assert first["/state?mode=peers", "application/msgpack"] == snapshot.packed("peers")
+    assert json.loads(first["/crawl/report", None])["generation"] == snapshot.generation
+
+    subtree = snapshot.index.subtree(())
+    assert subtree is not None
+    nodes = json.loads(first["/subtree?path=", None])["nodes"]
+    assert [node["id"] for node in nodes] == [node["id"] for node in subtree.nodes]
+
+
+async def test_write_failure(ygg: FakeYggdrasil, sockets: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "snapshot_path", sockets / "snapshot")
+
+    def broken(snapshot: object, mode: str) -> bytes:
+        raise KeyError(0)
+
+    monkeypatch.setattr(binary, "pack_snapshot", broken)
+
+    async with Crawler() as crawler:
+        # published in this process, only shared file is not written
+        await crawler.refresh()
+
+    assert crawler.snapshot.generation == 1
+    assert not (sockets / "snapshot").exists()
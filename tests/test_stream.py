@@ -0,0 +1,86 @@
+import gzip
+import json
+from typing import get_args
+
+import pytest
+
+from app import stream
+from app.models import MODE, EnrichedPeerData
+from app.snapshot import Snapshot
+from app.ygg import Addr
+
+MODES = [get_args(mode)[0] for mode in get_args(MODE)]
+# (3,) is not known, so path mode has placeholder node
+PATHS = [(1,), (1, 1), (1, 2), (1, 2, 1), (2,), (2, 1), (3, 1), (3, 2)]
+
+
+@pytest.fixture
+def snapshot(monkeypatch: pytest.MonkeyPatch) -> Snapshot:
+    # several chunks per array
+    monkeypatch.setattr(stream, "CHUNK", 3)
+
+    keys = [f"{i + 1:064x}" for i in range(len(PATHS))]
+    enriched = {
+        key: EnrichedPeerData(
+            addr=Addr(f"200::{i}"),
+            key=key,
+            path=path,
+            name=f"node{i}.cl{i % 3}",
+            buildplatform="linux" if i % 2 else "windows",
+        )
+        for i, (key, path) in enumerate(zip(keys, PATHS))
+    }
+    return Snapshot(
+        generation=1,
+        peers=dict(enriched),
+        enriched_peers=enriched,
+        peers_connections={key: [keys[(i + 1) % len(keys)], keys[(i + 3) % len(keys)]] for i, key in enumerate(keys)},
+    )
+
+
+def read_ndjson(data: bytes) -> dict[str, list[dict]]:
+    doc: dict[str, list[dict]] = {"nodes": [], "edges": []}
+    for line in data.decode().splitlines():
+        record = json.loads(line)
+        doc[record.pop("type") + "s"].append(record)
+    return doc
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_json_matches_state(snapshot: Snapshot, mode: MODE) -> None:
+    state = json.loads(snapshot.state_json(mode))
+    assert len(state["nodes"]) > stream.CHUNK and len(state["edges"]) > stream.CHUNK
+
+    assert json.loads(b"".join(stream.stream(snapshot, mode, "json"))) == state
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_ndjson_matches_state(snapshot: Snapshot, mode: MODE) -> None:
+    state = json.loads(snapshot.state_json(mode))
+    doc = read_ndjson(b"".join(stream.stream(snapshot, mode, "ndjson")))
+
+    assert doc == {"nodes": state["nodes"], "edges": state["edges"]}
+
+
+def test_fields(snapshot: Snapshot) -> None:
+    state = json.loads(snapshot.state_json("peers"))
+    doc = read_ndjson(b"".join(stream.stream(snapshot, "peers", "ndjson", fields="label, arrows,unknown")))
+
+    assert doc["nodes"] == [{"id": node["id"], "label": node["label"]} for node in state["nodes"]]
+    assert doc["edges"] == [
+        {"from": edge["from"], "to": edge["to"], "arrows": edge["arrows"]} for edge in state["edges"]
+    ]
+
+    # id, from and to are sent even if not asked for
+    doc = json.loads(b"".join(stream.stream(snapshot, "peers", "json", fields="cluster")))
+    assert {tuple(node) for node in doc["nodes"]} == {("id", "cluster")}
+    assert {tuple(edge) for edge in doc["edges"]} == {("from", "to")}
+    assert doc["clusters"] == state["clusters"]
+
+
+@pytest.mark.parametrize("format", ["ndjson", "json"])
+def test_gzip(snapshot: Snapshot, format: stream.FORMAT) -> None:
+    plain = b"".join(stream.stream(snapshot, "path", format))
+    compressed = b"".join(stream.stream(snapshot, "path", format, compression="gzip"))
+
+    assert gzip.decompress(compressed) == plain